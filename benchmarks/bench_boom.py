@@ -0,0 +1,405 @@
+"""
+Benchmarks of boom's own scaffolding paths
+
+Generates synthetic templates of a given number of files and times loading templates, creating a project, generating
+modules into a growing ``__init__.py`` and a cold ``boom --help``. Creating the venv and installing packages are stubbed
+so the benchmarks run offline. Importing boom must not import its heavy dependencies, which are only loaded when used,
+and importing it and a cold ``boom --help`` must stay within their time budgets.
+
+Usage::
+
+    python benchmarks/bench_boom.py --sizes 100 1000 10000 --output results.json
+    python benchmarks/bench_boom.py --compare results.json --threshold 1.25
+    python benchmarks/bench_boom.py --startup-only
+
+Results are written as JSON, comparing against a previous results file exits with status 1 if any benchmark got slower
+than the threshold. The exit status is also 1 if a startup check fails.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Files per directory of the synthetic templates
+FILES_PER_DIR = 50
+TEMPLATE_CONFIG = {
+    "slug": "synthetic",
+    "name": "Synthetic",
+    "description": "Synthetic template generated by the benchmarks",
+    "author": "Flask Boom",
+    "url": "https://github.com/TomGrozev/flask-boom",
+    "type": "app",
+    "module_init_func": "init_app(app)"
+}
+ROOT_VARS = {
+    'project_name': 'Bench Project',
+    'project_name_path': 'bench_project',
+    'project_description': 'Project generated by the benchmarks',
+    'author_name': 'Flask Boom',
+    'author_url': 'https://github.com/TomGrozev/flask-boom',
+}
+PROJECT_INIT = """from {{ project_name_path }}.routes import root_routes
+
+def init_app(app):
+    # Import blueprints
+    app.register_blueprint(root_routes)
+
+    # [b] Apps
+
+    # Any Additional App config
+"""
+MODULE_INIT = """def init_app(app):
+    from .routes import {{ module_name }}_routes
+    app.register_blueprint({{ module_name }}_routes)
+"""
+TEMPLATE_FILE = """# {{ project_name }}
+{% for i in range(20) %}
+def function_{{ i }}():
+    return '{{ project_name_path }} {{ author_name }} {{ i }}'
+{% endfor %}
+"""
+STATIC_FILE = 'static content line\n' * 40
+# Module imported by every command, and the dependencies it must only import on first use
+IMPORT_MODULE = 'boom.handlers.project_handler'
+LAZY_MODULES = ['inflect', 'jinja2', 'schema', 'PyInquirer', 'pip._internal', 'tabulate']
+# Seconds the cumulative import of IMPORT_MODULE may take
+IMPORT_BUDGET = 0.25
+# Seconds a cold ``boom --help`` may take, including starting the interpreter
+HELP_BUDGET = 0.5
+
+
+def make_template(templates_dir, files):
+    """
+    Writes a synthetic template
+
+    A quarter of the files are static, the rest are templates.
+
+    :param templates_dir: Templates folder to write the template into
+    :param files: Number of files
+    :return: Path of template
+    """
+    template_dir = os.path.join(templates_dir, 'synthetic')
+    project_dir = os.path.join(template_dir, 'project')
+    os.makedirs(os.path.join(project_dir, 'app'))
+    with open(os.path.join(template_dir, 'template.boom.json'), 'w') as f:
+        f.write(json.dumps(TEMPLATE_CONFIG))
+    with open(os.path.join(template_dir, 'requirements.txt'), 'w') as f:
+        f.write('flask\n')
+    with open(os.path.join(project_dir, '__init__.py.jinja2'), 'w') as f:
+        f.write(PROJECT_INIT)
+    with open(os.path.join(project_dir, 'routes.py'), 'w') as f:
+        f.write('from flask import Blueprint\n\nroot_routes = Blueprint("root", __name__)\n')
+    with open(os.path.join(project_dir, 'app', '__init__.py.jinja2'), 'w') as f:
+        f.write(MODULE_INIT)
+    with open(os.path.join(project_dir, 'app', 'routes.py.jinja2'), 'w') as f:
+        f.write('from flask import Blueprint\n\n{{ module_name }}_routes = Blueprint("{{ module_name }}", __name__)\n')
+    for i in range(files):
+        file_dir = os.path.join(project_dir, 'package_%d' % (i // FILES_PER_DIR))
+        os.makedirs(file_dir, exist_ok=True)
+        if i % 4 == 0:
+            with open(os.path.join(file_dir, 'static_%d.txt' % i), 'w') as f:
+                f.write(STATIC_FILE)
+        else:
+            with open(os.path.join(file_dir, 'module_%d.py.jinja2' % i), 'w') as f:
+                f.write(TEMPLATE_FILE)
+    return template_dir
+
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Silences boom's output while benchmarking
+    """
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        yield
+
+
+def get_context(templates_dir):
+    import click
+    from boom.__main__ import cli
+
+    return click.Context(cli, obj={'TEMPLATES_FOLDER': templates_dir})
+
+
+def load_templates(ctx):
+    from boom.handlers.template_handler import TemplateHandler
+
+    TemplateHandler.templates = []
+    TemplateHandler.environment = None
+    with quiet():
+        return TemplateHandler(ctx)
+
+
+def warm_up():
+    """
+    Imports the dependencies boom imports on first use, so they are not timed as part of the first benchmark
+    """
+    import jinja2
+    import schema
+    from boom.handlers.project_handler import get_inflect_engine
+    from boom.schema.project_config import project_config_schema
+
+    get_inflect_engine()
+
+
+def result(name, files, seconds):
+    return {'name': name, 'files': files, 'runs': len(seconds), 'seconds': seconds,
+            'median': statistics.median(seconds), 'min': min(seconds)}
+
+
+def bench_load_templates(work_dir, files, repeat):
+    """
+    Times loading templates without (cold) and with (warm) a template index
+    """
+    templates_dir = os.path.join(work_dir, 'templates')
+    make_template(templates_dir, files)
+    cold = []
+    warm = []
+    for i in range(repeat):
+        os.environ['BOOM_CACHE_DIR'] = os.path.join(work_dir, 'cache-load-%d' % i)
+        ctx = get_context(templates_dir)
+        with ctx:
+            start = time.perf_counter()
+            load_templates(ctx)
+            cold.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            load_templates(ctx)
+            warm.append(time.perf_counter() - start)
+    return [result('load_templates.cold', files, cold), result('load_templates.warm', files, warm)]
+
+
+def bench_create_project(work_dir, files, repeat):
+    """
+    Times creating a project, the first run compiles the templates and later runs use the bytecode cache
+    """
+    from boom.handlers.structure_handler import StructureHandler
+
+    templates_dir = os.path.join(work_dir, 'templates')
+    os.environ['BOOM_CACHE_DIR'] = os.path.join(work_dir, 'cache-create')
+    ctx = get_context(templates_dir)
+    seconds = []
+    with ctx:
+        template_config = load_templates(ctx).get_config_for_slug('synthetic')
+        for i in range(repeat):
+            project_root = os.path.join(work_dir, 'create-%d' % i)
+            root_vars = dict(ROOT_VARS, template=template_config)
+            start = time.perf_counter()
+            with quiet():
+                StructureHandler(ctx, root_vars, project_root).create_project_structure(template_config)
+            seconds.append(time.perf_counter() - start)
+            shutil.rmtree(project_root)
+    return [result('create_project_structure.first', files, seconds[:1]),
+            result('create_project_structure', files, seconds[1:] or seconds)]
+
+
+def bench_generate_modules(work_dir, modules):
+    """
+    Times generating modules one after the other, each registered in the growing project ``__init__.py``
+    """
+    from boom.handlers.package_handler import PackageHandler
+    from boom.handlers.project_handler import ProjectHandler
+
+    PackageHandler.start_venv = lambda self, *args, **kwargs: None
+    templates_dir = os.path.join(work_dir, 'templates')
+    os.environ['BOOM_CACHE_DIR'] = os.path.join(work_dir, 'cache-generate')
+    ctx = get_context(templates_dir)
+    project_root = os.path.join(work_dir, 'generate')
+    seconds = []
+    with ctx:
+        template_config = load_templates(ctx).get_config_for_slug('synthetic')
+        with quiet():
+            ProjectHandler(ctx).create_project(project_root, dict(ROOT_VARS, template=template_config))
+        cwd = os.getcwd()
+        os.chdir(project_root)
+        try:
+            for i in range(modules):
+                start = time.perf_counter()
+                with quiet():
+                    project_handler = ProjectHandler(ctx)
+                    project_handler.load_project(project_root)
+                    project_handler.generate_module('app', 'module%d' % i)
+                seconds.append(time.perf_counter() - start)
+        finally:
+            os.chdir(cwd)
+    tenth = max(1, modules // 10)
+    return [result('generate_module.first_%d' % tenth, modules, seconds[:tenth]),
+            result('generate_module.last_%d' % tenth, modules, seconds[-tenth:]),
+            result('generate_module.total', modules, [sum(seconds)])]
+
+
+def bench_cli_start(repeat):
+    """
+    Times a cold ``boom --help`` in a new interpreter
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-m', 'boom', '--help'], cwd=ROOT_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        seconds.append(time.perf_counter() - start)
+    return [result('cli.help', 0, seconds)]
+
+
+def parse_importtime(output):
+    """
+    Parses the output of ``python -X importtime``
+
+    :param output: stderr of the interpreter
+    :return: Dict of module name to cumulative import time in seconds
+    """
+    modules = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or '|' not in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if cumulative.strip().isdigit():
+            modules[name.strip()] = int(cumulative) / 1e6
+    return modules
+
+
+def bench_imports(repeat):
+    """
+    Times importing IMPORT_MODULE in a new interpreter with ``-X importtime``
+
+    :return: Results and the names of the LAZY_MODULES that were imported
+    """
+    seconds = []
+    imported = set()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import %s' % IMPORT_MODULE], cwd=ROOT_DIR,
+                                check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                universal_newlines=True).stderr
+        modules = parse_importtime(output)
+        seconds.append(modules.get(IMPORT_MODULE, 0))
+        imported.update(lazy for lazy in LAZY_MODULES for name in modules
+                        if name == lazy or name.startswith(lazy + '.'))
+    return [result('import.%s' % IMPORT_MODULE, 0, seconds)], sorted(imported)
+
+
+def check_startup(results, imported, import_budget, help_budget):
+    """
+    Checks the startup results against their budgets
+
+    :param results: Results of the startup benchmarks
+    :param imported: LAZY_MODULES imported by IMPORT_MODULE
+    :param import_budget: Seconds the import may take
+    :param help_budget: Seconds a cold ``boom --help`` may take
+    :return: Descriptions of the failed checks
+    """
+    failures = ['%s imports %s' % (IMPORT_MODULE, name) for name in imported]
+    medians = {r.get('name'): r.get('median') for r in results}
+    median = medians.get('import.%s' % IMPORT_MODULE)
+    if median is not None and median > import_budget:
+        failures.append('importing %s took %.3fs, over the %.3fs budget' % (IMPORT_MODULE, median, import_budget))
+    median = medians.get('cli.help')
+    if median is not None and median > help_budget:
+        failures.append('boom --help took %.3fs, over the %.3fs budget' % (median, help_budget))
+    return failures
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Prints the change of each benchmark against a previous results file
+
+    :return: Names of the benchmarks slower than threshold times the baseline
+    """
+    from tabulate import tabulate
+
+    with open(baseline_path, 'r') as f:
+        baseline = {(r.get('name'), r.get('files')): r for r in json.loads(f.read()).get('results', [])}
+    rows = []
+    regressions = []
+    for r in results:
+        base = baseline.get((r.get('name'), r.get('files')))
+        if base is None:
+            continue
+        ratio = r.get('median') / base.get('median') if base.get('median') else float('inf')
+        rows.append([r.get('name'), r.get('files'), '%.4f' % base.get('median'), '%.4f' % r.get('median'),
+                     '%.2fx' % ratio])
+        if ratio > threshold:
+            regressions.append('%s (%d files)' % (r.get('name'), r.get('files')))
+    print(tabulate(rows, headers=['Benchmark', 'Files', 'Baseline (s)', 'Current (s)', 'Ratio']))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks boom scaffolding')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                        help='Numbers of files of the synthetic templates')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per benchmark')
+    parser.add_argument('--modules', type=int, default=100, help='Modules generated into the growing __init__.py')
+    parser.add_argument('--output', default='-', help='File to write the JSON results to, - for stdout')
+    parser.add_argument('--compare', help='Results file to compare against')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='Ratio to the compared median above which a benchmark is a regression')
+    parser.add_argument('--import-budget', type=float, default=IMPORT_BUDGET,
+                        help='Seconds importing %s may take' % IMPORT_MODULE)
+    parser.add_argument('--help-budget', type=float, default=HELP_BUDGET, help='Seconds a cold boom --help may take')
+    parser.add_argument('--startup-only', action='store_true',
+                        help='Only run the import and CLI start benchmarks and checks')
+    args = parser.parse_args()
+
+    results = []
+    cache_dir = os.environ.get('BOOM_CACHE_DIR')
+    work_root = tempfile.mkdtemp(prefix='boom-bench-')
+    try:
+        if not args.startup_only:
+            warm_up()
+            for files in args.sizes:
+                work_dir = os.path.join(work_root, str(files))
+                print('Benchmarking %d files' % files, file=sys.stderr)
+                results += bench_load_templates(work_dir, files, args.repeat)
+                results += bench_create_project(work_dir, files, max(2, args.repeat))
+            print('Benchmarking %d modules' % args.modules, file=sys.stderr)
+            results += bench_generate_modules(os.path.join(work_root, str(min(args.sizes))), args.modules)
+        print('Benchmarking imports', file=sys.stderr)
+        startup_results, imported = bench_imports(max(5, args.repeat))
+        print('Benchmarking CLI start', file=sys.stderr)
+        startup_results += bench_cli_start(max(5, args.repeat))
+        results += startup_results
+    finally:
+        if cache_dir is None:
+            os.environ.pop('BOOM_CACHE_DIR', None)
+        else:
+            os.environ['BOOM_CACHE_DIR'] = cache_dir
+        shutil.rmtree(work_root, ignore_errors=True)
+
+    output = json.dumps({
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'results': results
+    }, indent=2)
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output)
+
+    failed = False
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print('Slower than %.2fx the baseline: %s' % (args.threshold, ', '.join(regressions)), file=sys.stderr)
+            failed = True
+    failures = check_startup(startup_results, imported, args.import_budget, args.help_budget)
+    for failure in failures:
+        print('Startup check failed: %s' % failure, file=sys.stderr)
+    if failed or failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
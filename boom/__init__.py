@@ -1,4 +1,6 @@
-import pkg_resources
-
-# Version of Boom
-__version__ = pkg_resources.require("flask-boom")[0].version
+def __getattr__(name):
+    # Version of Boom, resolved on first access as reading the package metadata is slow
+    if name == '__version__':
+        from importlib.metadata import version
+        return version('flask-boom')
+    raise AttributeError('module %r has no attribute %r' % (__name__, name))
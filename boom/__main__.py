@@ -1,49 +1,93 @@
+import importlib
 import os
+import time
 
 import click
 
+from boom.commands import COMMANDS
 from boom.utils.title_helper import get_title
 
-commands_folder = os.path.join(os.path.dirname(__file__), 'commands')
-
 
 class BaseGroup(click.Group):
     def list_commands(self, ctx):
-        rv = []
-        for filename in os.listdir(commands_folder):
-            if filename.endswith('.py'):
-                rv.append(filename[:-3])
-        rv.sort()
-        return rv
+        return sorted(COMMANDS)
 
     def get_command(self, ctx, cmd_name):
-        if cmd_name == '__init__':
+        command = self.match_command(ctx, cmd_name)
+        if command is None:
             return None
-        ns = {}
-        command = None
-        matches = [x for x in self.list_commands(ctx) if x.startswith(cmd_name[0])]
+        module_name, _ = COMMANDS[command]
+        # import_module returns the cached module from sys.modules after the first import
+        return importlib.import_module(module_name).run
+
+    def match_command(self, ctx, cmd_name):
+        """
+        Matches a command name or an unambiguous prefix of one
+
+        :param ctx: Click context
+        :param cmd_name: Name (or prefix) given on the command line
+        :return: Full command name or None if nothing matches
+        """
+        if cmd_name in COMMANDS:
+            return cmd_name
+        matches = [x for x in self.list_commands(ctx) if x.startswith(cmd_name)]
         if not matches:
             return None
-        elif len(matches) == 1:
-            command = matches[0]
-        else:
-            ctx.fail('Too many matches: %s' % ', '.join(sorted(matches)))
-        fn = os.path.join(commands_folder, command + '.py')
-        with open(fn) as f:
-            code = compile(f.read(), fn, 'exec')
-            eval(code, ns, ns)
-        return ns['run']
+        elif len(matches) > 1:
+            ctx.fail('Too many matches: %s' % ', '.join(matches))
+        return matches[0]
+
+    def format_commands(self, ctx, formatter):
+        # Uses the registry help so that listing commands does not import them
+        rows = [(name, COMMANDS[name][1]) for name in self.list_commands(ctx)]
+        if rows:
+            with formatter.section('Commands'):
+                formatter.write_dl(rows)
 
 
 @click.group(cls=BaseGroup)
+@click.option('--profile', is_flag=True, help='Print the time spent in each phase when done')
+@click.option('--trace', 'trace_path', type=click.Path(dir_okay=False, writable=True),
+              help='Write a Chrome trace of the phases to this file')
 @click.pass_context
-def cli(ctx):
+def cli(ctx, profile, trace_path):
     ctx.ensure_object(dict)
 
     ctx.obj['TEMPLATES_FOLDER'] = os.path.join(os.path.dirname(__file__), 'templates')
 
     click.echo(get_title())
 
+    if profile or trace_path is not None:
+        start_trace(ctx, profile, trace_path)
+
+
+def start_trace(ctx, profile, trace_path):
+    """
+    Traces the phases of the invoked command, reporting them when the context closes
+
+    :param ctx: Click context
+    :param profile: Print a summary of the phases
+    :param trace_path: Path to write the Chrome trace to
+    """
+    from boom.utils.trace_helper import start_tracing
+
+    tracer = start_tracing()
+
+    def report():
+        tracer.add_event('boom %s' % (ctx.invoked_subcommand or ''), tracer.start, time.perf_counter_ns() - tracer.start)
+        if trace_path is not None:
+            tracer.write(trace_path)
+            click.secho('Trace written to %s' % trace_path, fg='green', err=True)
+        if profile:
+            from tabulate import tabulate
+
+            rows = [[name, count, '%.1f' % total, '%.1f' % longest,
+                     ', '.join('%s=%s' % (key, value) for key, value in sorted(args.items()))]
+                    for name, count, total, longest, args in tracer.summary()]
+            click.echo(tabulate(rows, headers=['Phase', 'Count', 'Total (ms)', 'Max (ms)', 'Totals']), err=True)
+
+    ctx.call_on_close(report)
+
 
 if __name__ == '__main__':
     cli()
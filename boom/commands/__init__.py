@@ -0,0 +1,26 @@
+# Registry of the available commands
+#
+# Maps the command name to the module defining its ``run`` command and the short help shown in ``boom --help``. Command
+# modules are only imported (and then cached in ``sys.modules``) when the command is invoked, so listing the commands
+# never imports a command module. New commands must be added here, and take their short help from here with
+# get_short_help.
+COMMANDS = {
+    'bench': ('boom.commands.bench', 'Measures the latency of the routes of the app under load'),
+    'cache': ('boom.commands.cache', 'Manages the wheelhouse used to install packages'),
+    'generate': ('boom.commands.generate', 'Generates a new module in project'),
+    'indexes': ('boom.commands.indexes', 'Checks the indexes declared by the models exist in MongoDB'),
+    'new': ('boom.commands.new', 'Creates a new project'),
+    'start': ('boom.commands.start', 'Starts Flask Dev Server'),
+    'sync': ('boom.commands.sync', 'Updates project files to the current template'),
+    'version': ('boom.commands.version', 'Gets version information of boom'),
+}
+
+
+def get_short_help(name):
+    """
+    Gets the short help of a command, as shown in ``boom --help``
+
+    :param name: Command name
+    :return: Short help
+    """
+    return COMMANDS[name][1]
@@ -0,0 +1,85 @@
+import json
+import platform
+import time
+
+import click
+from termcolor import colored
+
+from boom.commands import get_short_help
+from boom.handlers.bench_handler import BenchHandler, PERCENTILES, get_free_port
+from boom.handlers.server_handler import ServerHandler
+
+
+@click.command('bench', short_help=get_short_help('bench'))
+@click.argument('FILE', required=False)
+@click.option('--app', 'app_name', default='app', show_default=True, help='Name of the flask app in FILE')
+@click.option('-c', '--concurrency', type=click.IntRange(min=1), default=10, show_default=True,
+              help='Concurrent connections')
+@click.option('-d', '--duration', type=click.FloatRange(min=0.1), default=10.0, show_default=True,
+              help='Seconds to run the load for')
+@click.option('--warmup', type=click.FloatRange(min=0), default=1.0, show_default=True,
+              help='Seconds of load before measuring')
+@click.option('-r', '--route', 'routes', multiple=True,
+              help='Path to request instead of the routes of the app, e.g. for routes with arguments')
+@click.option('--prod', is_flag=True, help='Serve the app with gunicorn instead of the flask development server')
+@click.option('-w', '--workers', type=click.IntRange(min=1), help='Worker processes in --prod mode [default: CPUs]')
+@click.option('--threads', type=click.IntRange(min=1), help='Threads per worker in --prod mode [default: CPUs]')
+@click.option('-p', '--port', type=click.IntRange(min=0, max=65535), default=0, help='Port to serve the app on '
+              '[default: a free port]')
+@click.option('-o', '--output', type=click.Path(dir_okay=False, writable=True), help='Write the results as JSON')
+@click.option('-v', '--verbose', count=True)
+@click.pass_context
+def run(ctx, **kwargs):
+    from tabulate import tabulate
+
+    verbose = kwargs.get('verbose')
+    bench_handler = BenchHandler(ctx, verbose=verbose)
+    start_file_name = bench_handler.server_handler.find_start_file(kwargs.get('file', None))
+    if start_file_name is None:
+        click.secho('Could not find flask start file. Try specifying it.')
+        return
+
+    paths = list(kwargs.get('routes'))
+    if len(paths) == 0:
+        paths = bench_handler.get_bench_paths(bench_handler.discover_routes(start_file_name, kwargs.get('app_name')))
+    if len(paths) == 0:
+        ctx.fail(colored('No routes to benchmark, specify them with --route', 'red', attrs=['bold']))
+
+    port = kwargs.get('port') or get_free_port()
+    click.secho('Starting %s on port %d' % (start_file_name, port), fg='cyan')
+    process = bench_handler.start_server(start_file_name, port, app_name=kwargs.get('app_name'),
+                                         prod=kwargs.get('prod'), workers=kwargs.get('workers'),
+                                         threads=kwargs.get('threads'))
+    try:
+        if kwargs.get('warmup') > 0:
+            bench_handler.run_load(paths, port, kwargs.get('concurrency'), kwargs.get('warmup'))
+        click.secho('Benchmarking %d routes with %d connections for %gs' % (
+            len(paths), kwargs.get('concurrency'), kwargs.get('duration')), fg='cyan')
+        start = time.perf_counter()
+        results = bench_handler.run_load(paths, port, kwargs.get('concurrency'), kwargs.get('duration'))
+        elapsed = time.perf_counter() - start
+    finally:
+        ServerHandler.stop_process(process)
+
+    rows = BenchHandler.summarise(results, elapsed)
+    click.echo(tabulate([[row.get('path'), row.get('requests'), row.get('errors'), '%.1f' % row.get('rps')] +
+                         ['-' if row.get('p%d' % p) is None else '%.2f' % row.get('p%d' % p) for p in PERCENTILES]
+                         for row in rows],
+                        headers=['Route', 'Requests', 'Errors', 'Req/s'] + ['p%d (ms)' % p for p in PERCENTILES]))
+    if verbose >= 1:
+        for row in rows[:-1]:
+            click.secho('%s: %s' % (row.get('path'), ', '.join(
+                '%d x %s' % (count, status) for status, count in sorted(row.get('statuses').items()))), fg='yellow')
+
+    if kwargs.get('output') is not None:
+        with open(kwargs.get('output'), 'w') as f:
+            f.write(json.dumps({
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'server': 'gunicorn' if kwargs.get('prod') else 'flask',
+                'concurrency': kwargs.get('concurrency'),
+                'duration': elapsed,
+                'results': rows
+            }, indent=2))
+        click.secho('Results written to %s' % kwargs.get('output'), fg='green')
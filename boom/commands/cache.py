@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import click
+from termcolor import colored
+
+from boom.commands import get_short_help
+from boom.handlers.package_handler import PackageHandler
+from boom.utils.requirements_helper import wheel_name
+
+
+@click.group('cache', short_help=get_short_help('cache'))
+def run():
+    pass
+
+
+@run.command('prefill', short_help='Fills the wheelhouse with the requirements of templates')
+@click.argument('templates', required=False, nargs=-1, type=click.STRING)
+@click.option('-v', '--verbose', count=True)
+@click.pass_context
+def prefill(ctx, templates, verbose):
+    from boom.handlers.template_handler import TemplateHandler
+
+    template_handler = TemplateHandler(ctx, verbose)
+    template_configs = template_handler.templates
+    if len(templates) > 0:
+        template_configs = [template_handler.get_config_for_slug(slug) for slug in templates]
+        if None in template_configs:
+            unknown = [slug for slug, config in zip(templates, template_configs) if config is None]
+            ctx.fail(colored('Unknown template: %s' % ', '.join(unknown), 'red', attrs=['bold']))
+
+    for template_config in template_configs:
+        req_path = os.path.join(template_config.get('abs_dir'), 'requirements.txt')
+        if not TemplateHandler.exists(req_path):
+            continue
+        click.secho('########### Caching Requirements of %s ###########' % template_config.get('slug'), fg='cyan')
+        tmp_path = None
+        if TemplateHandler.is_archive_path(req_path):
+            # Pip needs the requirements of templates in template packs as a file
+            fd, tmp_path = tempfile.mkstemp(suffix='.txt')
+            with os.fdopen(fd, 'w') as f:
+                f.write(TemplateHandler.read_text(req_path))
+            req_path = tmp_path
+        try:
+            PackageHandler.fill_wheelhouse(sys.executable, req_path, verbose)
+        except subprocess.CalledProcessError as e:
+            if verbose >= 2:
+                click.secho(e.__str__(), fg='yellow')
+            ctx.fail(colored('Failed to cache requirements.', 'red', attrs=['bold']))
+        finally:
+            if tmp_path is not None:
+                os.remove(tmp_path)
+    click.secho('Wheelhouse filled: %s' % PackageHandler.get_wheelhouse(), fg='green')
+
+
+@run.command('list', short_help='Lists the wheels in the wheelhouse')
+def list_wheels():
+    from tabulate import tabulate
+
+    wheelhouse = PackageHandler.get_wheelhouse()
+    wheels = get_wheels(wheelhouse)
+    click.secho('Wheelhouse: %s\n' % wheelhouse, fg='cyan', bold=True)
+    rows = [(filename, '%.1f kB' % (os.path.getsize(os.path.join(wheelhouse, filename)) / 1024))
+            for filename in wheels]
+    click.echo(tabulate(rows, headers=['Wheel', 'Size']))
+    total = sum(os.path.getsize(os.path.join(wheelhouse, filename)) for filename in wheels)
+    click.secho('\n%d wheels, %.1f MB' % (len(wheels), total / 1024 / 1024), fg='green')
+
+
+@run.command('prune', short_help='Removes wheels from the wheelhouse')
+@click.option('--all', 'prune_all', is_flag=True, help='Remove every wheel')
+@click.option('--older-than', type=click.INT, help='Remove wheels not updated in this many days')
+@click.option('-v', '--verbose', count=True)
+def prune(prune_all, older_than, verbose):
+    """
+    Removes wheels superseded by a newer wheel of the same package, or the wheels selected by the options
+    """
+    wheelhouse = PackageHandler.get_wheelhouse()
+    wheels = sorted(get_wheels(wheelhouse), key=lambda w: os.path.getmtime(os.path.join(wheelhouse, w)), reverse=True)
+    if prune_all:
+        to_remove = wheels
+    elif older_than is not None:
+        cutoff = time.time() - older_than * 24 * 60 * 60
+        to_remove = [w for w in wheels if os.path.getmtime(os.path.join(wheelhouse, w)) < cutoff]
+    else:
+        seen = set()
+        to_remove = []
+        for filename in wheels:
+            if wheel_name(filename) in seen:
+                to_remove.append(filename)
+            seen.add(wheel_name(filename))
+    for filename in to_remove:
+        if verbose >= 1:
+            click.secho('Removing %s' % filename, fg='yellow')
+        os.unlink(os.path.join(wheelhouse, filename))
+    click.secho('Removed %d wheels' % len(to_remove), fg='green')
+
+
+def get_wheels(wheelhouse) -> [str]:
+    return sorted(filename for filename in os.listdir(wheelhouse) if wheel_name(filename) is not None)
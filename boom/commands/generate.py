@@ -1,14 +1,23 @@
+import json
 import os
 import click
+from termcolor import colored
 
+from boom.commands import get_short_help
 from boom.handlers.project_handler import ProjectHandler
 
 
-@click.command('generate', short_help='Generates a new module in project')
-@click.argument('module', required=True, type=click.STRING)
-@click.argument('name', required=True, nargs=-1, type=click.STRING)
+@click.command('generate', short_help=get_short_help('generate'))
+@click.argument('module', required=False, type=click.STRING)
+@click.argument('name', required=False, nargs=-1, type=click.STRING)
 @click.option('-r', '--project_root', default=os.getcwd(), type=click.Path(exists=True, file_okay=False, writable=True))
 @click.option('-m', '--model', type=click.STRING)
+@click.option('-p', '--pair', 'pairs', multiple=True, nargs=2, type=click.STRING, metavar='MODULE NAME',
+              help='Module and name of an additional module to generate, can be repeated')
+@click.option('-P', '--pair-model', 'pair_models', multiple=True, nargs=3, type=click.STRING,
+              metavar='MODULE NAME MODEL', help='Like --pair for a module generated with a model, can be repeated')
+@click.option('-f', '--from', 'manifest', type=click.File('r'),
+              help='JSON manifest listing modules to generate, e.g. [{"module": "app", "name": "users"}]')
 @click.option('-v', '--verbose', count=True)
 @click.pass_context
 def run(ctx, **kwargs):
@@ -25,6 +34,33 @@ def run(ctx, **kwargs):
     if len(kwargs.get('name')) > 0:
         kwargs.update(name='-'.join(kwargs.get('name')))
 
+    modules = []
+    if kwargs.get('module') is not None:
+        if len(kwargs.get('name')) == 0:
+            ctx.fail(colored('Missing argument NAME', 'red', attrs=['bold']))
+        modules.append({'module': kwargs.get('module'), 'name': kwargs.get('name'), 'model': kwargs.get('model')})
+    modules.extend({'module': module, 'name': name} for module, name in kwargs.get('pairs'))
+    modules.extend({'module': module, 'name': name, 'model': model}
+                   for module, name, model in kwargs.get('pair_models'))
+    if kwargs.get('manifest') is not None:
+        modules.extend(__load_manifest__(ctx, kwargs.get('manifest')))
+    if len(modules) == 0:
+        ctx.fail(colored('Nothing to generate. Give a MODULE and NAME, --pair, --pair-model or --from', 'red',
+                         attrs=['bold']))
+
     project_handler = ProjectHandler(ctx, verbose=verbose)
     project_handler.load_project(kwargs.get('project_root', os.getcwd()))
-    project_handler.generate_module(kwargs.get('module'), kwargs.get('name'), kwargs.get('model'))
+    project_handler.generate_modules(modules)
+
+
+def __load_manifest__(ctx, manifest) -> list:
+    try:
+        modules = json.loads(manifest.read())
+    except ValueError as e:
+        ctx.fail(colored('Invalid manifest: %s' % e, 'red', attrs=['bold']))
+    if isinstance(modules, dict):
+        modules = modules.get('modules', [])
+    if not isinstance(modules, list) or \
+            not all(isinstance(m, dict) and m.get('module') and m.get('name') for m in modules):
+        ctx.fail(colored('Invalid manifest: expected a list of objects with module and name', 'red', attrs=['bold']))
+    return modules
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+
+import click
+from termcolor import colored
+
+import boom.scripts
+from boom.commands import get_short_help
+from boom.handlers.project_handler import ProjectHandler
+from boom.handlers.server_handler import ServerHandler
+
+# Script comparing the declared and existing indexes, run with the project's python
+CHECK_INDEXES_SCRIPT = os.path.join(os.path.dirname(boom.scripts.__file__), 'check_indexes.py')
+
+
+@click.command('indexes', short_help=get_short_help('indexes'))
+@click.option('-r', '--project_root', default=os.getcwd(), type=click.Path(exists=True, file_okay=False))
+@click.option('--host', help='MongoDB URI, e.g. of a local mongod [default: MONGODB_URI of the project config]')
+@click.option('--create', is_flag=True, help='Create the missing indexes')
+@click.option('-v', '--verbose', count=True)
+@click.pass_context
+def run(ctx, **kwargs):
+    from tabulate import tabulate
+
+    verbose = kwargs.get('verbose')
+    project_handler = ProjectHandler(ctx, verbose=verbose)
+    project_handler.load_project(kwargs.get('project_root'))
+    server_handler = ServerHandler(ctx, project_root=project_handler.project_root, verbose=verbose)
+
+    args = [server_handler.get_python(), CHECK_INDEXES_SCRIPT, ProjectHandler.project_config.get('project_name_path')]
+    if kwargs.get('host') is not None:
+        args += ['--host', kwargs.get('host')]
+    if kwargs.get('create'):
+        args.append('--create')
+    try:
+        output = subprocess.run(args, cwd=project_handler.project_root, check=True, stdout=subprocess.PIPE,
+                                stderr=subprocess.PIPE, universal_newlines=True).stdout
+    except subprocess.CalledProcessError as e:
+        lines = e.stderr.strip().splitlines()
+        if verbose >= 1:
+            click.secho(e.stderr, fg='yellow')
+        elif len(lines) > 0:
+            click.secho(lines[-1], fg='yellow')
+        ctx.fail(colored('Could not check the indexes of the project models', 'red', attrs=['bold']))
+        return
+    results = json.loads(output)
+
+    def format_indexes(indexes):
+        # Same notation as meta['indexes'], e.g. -created_at, or the index type, e.g. location(2dsphere)
+        return ', '.join(' '.join(field if direction == 1 else '-' + field if direction == -1 else
+                                  '%s(%s)' % (field, direction) for field, direction in index)
+                         for index in indexes) or '-'
+
+    click.echo(tabulate([[result.get('model'), result.get('collection'), format_indexes(result.get('missing')),
+                          format_indexes(result.get('extra'))] for result in results],
+                        headers=['Model', 'Collection', 'Missing', 'Not declared']))
+    missing = sum(len(result.get('missing')) for result in results)
+    if missing > 0:
+        click.secho('%d declared indexes are missing, create them with: boom indexes --create' % missing, fg='red',
+                    bold=True)
+        ctx.exit(1)
+    click.secho('All %d models have their declared indexes' % len(results), fg='green', bold=True)
@@ -2,21 +2,24 @@ import os
 import re
 
 import click
-from PyInquirer import prompt
 from termcolor import colored
 
+from boom.commands import get_short_help
 from boom.handlers.project_handler import ProjectHandler
 from boom.handlers.template_handler import TemplateHandler
 
 url_pattern = re.compile("^http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*(),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+$")
 
 
-@click.command('new', short_help='Creates a new project')
+@click.command('new', short_help=get_short_help('new'))
 @click.argument('project_name', required=False, nargs=-1, type=click.STRING)
 @click.option('-a', '--author_name', nargs=2, type=click.STRING)
 @click.option('-u', '--author_url', type=click.STRING)
 @click.option('-r', '--project_root', type=click.Path(file_okay=False, writable=True))
 @click.option('-v', '--verbose', count=True)
+@click.option('--dry-run', is_flag=True, help='Report the files that would be created without writing anything')
+@click.option('--keep-venv', is_flag=True, help='Reuse the venv of an existing project when overwriting it')
+@click.option('--fresh-venv', is_flag=True, help='Install packages instead of cloning the cached venv of the template')
 @click.pass_context
 def run(ctx, **kwargs):
     click.secho(
@@ -27,6 +30,9 @@ def run(ctx, **kwargs):
     verbose = kwargs.get('verbose', 0)
     if verbose is not None:
         kwargs.pop('verbose')
+    dry_run = kwargs.pop('dry_run', False)
+    keep_venv = kwargs.pop('keep_venv', False)
+    fresh_venv = kwargs.pop('fresh_venv', False)
 
     # Convert tuple project name to string
     if len(kwargs.get('project_name')) > 0:
@@ -88,6 +94,7 @@ def run(ctx, **kwargs):
         }
     ]
 
+    from PyInquirer import prompt
     answers = prompt(questions)
     root_vars = {**kwargs, **answers}
 
@@ -106,7 +113,8 @@ def run(ctx, **kwargs):
 
     # Create Handler (also validates structure)
     project_structure = ProjectHandler(ctx, verbose=verbose)
-    project_structure.create_project(project_root, root_vars)
+    project_structure.create_project(project_root, root_vars, dry_run=dry_run, keep_venv=keep_venv,
+                                     fresh_venv=fresh_venv)
 
 
 def __validate_project_name__(project_name) -> bool:
@@ -1,28 +1,37 @@
-import os
-
 import click
+from termcolor import colored
 
+from boom.commands import get_short_help
+from boom.handlers.server_handler import DEFAULT_BIND, DEFAULT_GRACEFUL_TIMEOUT, ServerHandler
 
-@click.command('start', short_help='Starts Flask Dev Server')
-@click.argument('FILE', required=False)
-def run(**kwargs):
-    if kwargs.get('file', None) is not None:
-        start_file_name: str = kwargs.get('file', None)
-        if not start_file_name.endswith('.py'):
-            start_file_name += '.py'
-    else:
-        # Possible start files
-        start_files = ['app.py', 'application.py', 'server.py', 'flask.py']
-
-        dir_files = os.listdir()
 
-        # Try find application file
-        found_start_files = list(set(start_files).intersection(dir_files))
-        if len(found_start_files) == 0:
-            click.secho('Could not find flask start file. Try specifying it.')
-            return
-
-        start_file_name = found_start_files[0]
+@click.command('start', short_help=get_short_help('start'))
+@click.argument('FILE', required=False)
+@click.option('--prod', is_flag=True, help='Serve the app with gunicorn, preloaded and forked into several workers')
+@click.option('-w', '--workers', type=click.IntRange(min=1), help='Worker processes in --prod mode [default: CPUs]')
+@click.option('--threads', type=click.IntRange(min=1), help='Threads per worker in --prod mode [default: CPUs]')
+@click.option('-b', '--bind', default=DEFAULT_BIND, show_default=True, help='Address to listen on in --prod mode')
+@click.option('--app', 'app_name', default='app', show_default=True, help='Name of the flask app in FILE')
+@click.option('--graceful-timeout', type=click.IntRange(min=0), default=DEFAULT_GRACEFUL_TIMEOUT, show_default=True,
+              help='Seconds workers get to finish requests when restarting in --prod mode')
+@click.option('--watch', is_flag=True, help='Restart the dev server when python files change (needs watchdog)')
+@click.option('--ignore', multiple=True, help='Directory names not watched, on top of venv, .git and __pycache__')
+@click.option('-v', '--verbose', count=True)
+@click.pass_context
+def run(ctx, **kwargs):
+    server_handler = ServerHandler(ctx, verbose=kwargs.get('verbose'))
+    start_file_name = server_handler.find_start_file(kwargs.get('file', None))
+    if start_file_name is None:
+        click.secho('Could not find flask start file. Try specifying it.')
+        return
 
-    os.environ['FLASK_ENV'] = 'development'
-    os.system('python ' + start_file_name)
+    if kwargs.get('prod') and kwargs.get('watch'):
+        ctx.fail(colored('--watch can not be used with --prod', 'red', attrs=['bold']))
+    if kwargs.get('prod'):
+        server_handler.start_prod(start_file_name, app_name=kwargs.get('app_name'), workers=kwargs.get('workers'),
+                                  threads=kwargs.get('threads'), bind=kwargs.get('bind'),
+                                  graceful_timeout=kwargs.get('graceful_timeout'))
+    elif kwargs.get('watch'):
+        server_handler.start_watch(start_file_name, ignore=kwargs.get('ignore'))
+    else:
+        server_handler.start_dev(start_file_name)
@@ -0,0 +1,38 @@
+import os
+
+import click
+
+from boom.commands import get_short_help
+from boom.handlers.project_handler import ProjectHandler
+
+
+@click.command('sync', short_help=get_short_help('sync'))
+@click.option('-r', '--project_root', default=os.getcwd(), type=click.Path(exists=True, file_okay=False, writable=True))
+@click.option('--force', is_flag=True, help='Overwrite files that were changed since boom wrote them')
+@click.option('-v', '--verbose', count=True)
+@click.pass_context
+def run(ctx, **kwargs):
+    # Set verbose level
+    verbose = kwargs.get('verbose', 0)
+    if verbose is not None:
+        kwargs.pop('verbose')
+
+    project_handler = ProjectHandler(ctx, verbose=verbose)
+    project_handler.load_project(kwargs.get('project_root', os.getcwd()))
+    report = project_handler.sync_project(force=kwargs.get('force'))
+
+    for status, color in [('created', 'green'), ('updated', 'green')]:
+        for rel_path in report.get(status, []):
+            click.secho('%s %s' % (status.capitalize(), rel_path), fg=color)
+    if verbose >= 1:
+        for rel_path in report.get('unchanged', []):
+            click.secho('Unchanged %s' % rel_path, fg='yellow')
+    edited = report.get('edited', [])
+    for rel_path in edited:
+        click.secho('Skipped %s, it was changed since boom wrote it' % rel_path, fg='yellow', bold=True)
+    click.secho('Sync Complete: %d created, %d updated, %d unchanged, %d skipped' % (
+        len(report.get('created', [])), len(report.get('updated', [])), len(report.get('unchanged', [])),
+        len(edited)), fg='green', bold=True)
+    if len(edited) > 0:
+        click.secho('Merge the template changes into the skipped files by hand or run again with --force to '
+                    'overwrite them.', fg='yellow')
@@ -2,12 +2,10 @@ import platform
 import sys
 import click
 import boom
+from boom.commands import get_short_help
 
-from pip._internal.operations import freeze
-from tabulate import tabulate
 
-
-@click.command('version', short_help='Gets version information of boom')
+@click.command('version', short_help=get_short_help('version'))
 def run():
     click.echo('\n')
     click.echo('Flask Boom: %s' % boom.__version__)
@@ -18,6 +16,10 @@ def run():
         click.secho('\nVirtual Environment Active\n', fg='green', bold=True)
         # Package Versions
         click.secho('Installed Packages\n', fg='cyan', bold=True)
-        package_freeze = freeze.freeze()
-        rows = [package.split('==', maxsplit=1) for package in package_freeze]
+        from tabulate import tabulate
+        from boom.utils.requirements_helper import get_installed_distributions
+        # Same packages as pip freeze lists by default
+        installed = get_installed_distributions()
+        rows = sorted([(dist.metadata['Name'], dist.version) for name, dist in installed.items()
+                       if name not in ('pip', 'setuptools', 'wheel', 'distribute')], key=lambda r: r[0].lower())
         click.echo(tabulate(rows, headers=['Package', 'Version']))
\ No newline at end of file
@@ -0,0 +1,261 @@
+import asyncio
+import itertools
+import json
+import os
+import socket
+import subprocess
+import time
+
+import click
+from termcolor import colored
+
+import boom.scripts
+from boom.handlers.server_handler import ServerHandler
+
+# Script printing the routes of the app, run with the project's python
+LIST_ROUTES_SCRIPT = os.path.join(os.path.dirname(boom.scripts.__file__), 'list_routes.py')
+# Seconds to wait for the server to accept connections
+SERVER_START_TIMEOUT = 30
+PERCENTILES = [50, 95, 99]
+
+
+class BenchHandler:
+    """
+    Bench Handler class
+
+    Serves the project's flask app on a local port and measures the latency of its routes under concurrent load
+    """
+    __ctx__ = None
+    server_handler: ServerHandler = None
+    verbose: int = 0
+
+    def __init__(self, ctx, project_root=None, verbose=0) -> None:
+        """
+        Initialises handler with context, project root and verbosity
+
+        :param ctx: Click context
+        :param project_root: Project root, defaults to the current directory
+        :param verbose: Verbosity level
+        """
+        self.__ctx__ = ctx
+        self.server_handler = ServerHandler(ctx, project_root=project_root, verbose=verbose)
+        self.verbose = verbose
+
+    def discover_routes(self, start_file, app_name='app'):
+        """
+        Gets the routes of the app from its url map
+
+        :param start_file: Name of start file
+        :param app_name: Name of the flask app in the start file
+        :return: List of routes with rule, endpoint, methods and arguments
+        """
+        try:
+            output = subprocess.run([self.server_handler.get_python(), LIST_ROUTES_SCRIPT, start_file, app_name],
+                                    cwd=self.server_handler.project_root, check=True, stdout=subprocess.PIPE,
+                                    stderr=subprocess.PIPE, universal_newlines=True).stdout
+        except subprocess.CalledProcessError as e:
+            if self.verbose >= 1:
+                click.secho(e.stderr, fg='yellow')
+            self.__ctx__.fail(colored('Could not load the routes of %s:%s' % (start_file, app_name), 'red',
+                                      attrs=['bold']))
+            return []
+        return json.loads(output)
+
+    def get_bench_paths(self, routes):
+        """
+        Gets the paths of the routes that can be requested without arguments
+
+        :param routes: Routes as returned by discover_routes
+        :return: List of paths
+        """
+        paths = []
+        for route in routes:
+            if 'GET' not in route.get('methods') or len(route.get('arguments')) > 0:
+                if self.verbose >= 1:
+                    click.secho('Skipping %s, it needs arguments or does not accept GET' % route.get('rule'),
+                                fg='yellow')
+                continue
+            if route.get('rule') not in paths:
+                paths.append(route.get('rule'))
+        return paths
+
+    def start_server(self, start_file, port, app_name='app', prod=False, workers=None, threads=None):
+        """
+        Starts the app on a local port in the background
+
+        :param start_file: Name of start file
+        :param port: Port to listen on
+        :param app_name: Name of the flask app in the start file
+        :param prod: Serve the app with gunicorn instead of the flask development server
+        :param workers: Number of gunicorn worker processes
+        :param threads: Number of threads per gunicorn worker
+        :return: Server process
+        """
+        python = self.server_handler.get_python()
+        if prod:
+            self.server_handler.check_gunicorn(python)
+            args = self.server_handler.get_gunicorn_args(python, start_file, app_name=app_name, workers=workers,
+                                                         threads=threads, bind='127.0.0.1:%d' % port)
+            env = dict(os.environ, FLASK_ENV='production')
+        else:
+            args = [python, '-m', 'flask', 'run', '--host', '127.0.0.1', '--port', str(port), '--with-threads',
+                    '--no-reload']
+            env = dict(os.environ, FLASK_APP='%s:%s' % (start_file, app_name), FLASK_ENV='development')
+            env.pop('FLASK_DEBUG', None)
+        if self.verbose >= 1:
+            click.secho(' '.join(args), fg='yellow')
+        # The server logs every request, only shown when very verbose
+        output = None if self.verbose >= 2 else subprocess.DEVNULL
+        process = subprocess.Popen(args, cwd=self.server_handler.project_root, env=env, stdout=output, stderr=output)
+        self.wait_for_server(process, port)
+        return process
+
+    def wait_for_server(self, process, port, timeout=SERVER_START_TIMEOUT):
+        """
+        Waits until the server accepts connections
+
+        :param process: Server process
+        :param port: Port the server listens on
+        :param timeout: Seconds to wait
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                self.__ctx__.fail(colored('The server exited with status %d, run with -vv to see its output' %
+                                          process.returncode, 'red', attrs=['bold']))
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return
+            except OSError:
+                time.sleep(0.1)
+        ServerHandler.stop_process(process)
+        self.__ctx__.fail(colored('The server did not start within %d seconds' % timeout, 'red', attrs=['bold']))
+
+    def run_load(self, paths, port, concurrency=10, duration=10.0):
+        """
+        Requests the paths round robin over concurrent keep-alive connections for a duration
+
+        :param paths: Paths to request
+        :param port: Port the server listens on
+        :param concurrency: Number of concurrent connections
+        :param duration: Seconds to run for
+        :return: Dict of path to dict of latencies in seconds, errors and status counts
+        """
+        results = {path: {'latencies': [], 'errors': 0, 'statuses': {}} for path in paths}
+        asyncio.run(self.__run_load__(paths, port, concurrency, duration, results))
+        return results
+
+    async def __run_load__(self, paths, port, concurrency, duration, results):
+        routes = itertools.cycle(paths)
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*[self.__connection__(routes, port, deadline, results) for _ in range(concurrency)])
+
+    async def __connection__(self, routes, port, deadline, results):
+        reader = writer = None
+        try:
+            while time.perf_counter() < deadline:
+                path = next(routes)
+                result = results[path]
+                start = time.perf_counter()
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                    writer.write(('GET %s HTTP/1.1\r\nHost: 127.0.0.1:%d\r\nUser-Agent: boom-bench\r\n\r\n' % (
+                        path, port)).encode('latin-1'))
+                    await writer.drain()
+                    status, keep_alive = await read_response(reader)
+                except (OSError, EOFError, ValueError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+                    result['errors'] += 1
+                    status, keep_alive = None, False
+                else:
+                    result['latencies'].append(time.perf_counter() - start)
+                    result['statuses'][status] = result['statuses'].get(status, 0) + 1
+                    if status >= 400:
+                        result['errors'] += 1
+                if not keep_alive and writer is not None:
+                    writer.close()
+                    reader = writer = None
+        finally:
+            if writer is not None:
+                writer.close()
+
+    @staticmethod
+    def summarise(results, duration):
+        """
+        Sums up the results of each path
+
+        :param results: Results as returned by run_load
+        :param duration: Seconds the load ran for
+        :return: List of dicts with path, requests, errors, requests per second and latency percentiles in ms
+        """
+        rows = []
+        all_latencies = []
+        for path, result in list(results.items()) + [('Total', None)]:
+            if result is None:
+                result = {'latencies': all_latencies, 'errors': sum(r.get('errors') for r in results.values()),
+                          'statuses': {}}
+            else:
+                all_latencies += result.get('latencies')
+            latencies = sorted(result.get('latencies'))
+            row = {'path': path, 'requests': len(latencies), 'errors': result.get('errors'),
+                   'rps': len(latencies) / duration if duration else 0.0, 'statuses': result.get('statuses')}
+            for p in PERCENTILES:
+                row['p%d' % p] = percentile(latencies, p) * 1000 if latencies else None
+            rows.append(row)
+        return rows
+
+
+async def read_response(reader):
+    """
+    Reads a HTTP/1.1 response, discarding the body
+
+    :param reader: Stream reader of connection
+    :return: Tuple of status code and whether the connection can be reused
+    """
+    head = (await reader.readuntil(b'\r\n\r\n')).decode('latin-1').split('\r\n')
+    version, status = head[0].split(' ', 2)[:2]
+    headers = {}
+    for line in head[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip().lower()
+    keep_alive = version == 'HTTP/1.1' and headers.get('connection') != 'close'
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            if size == 0:
+                # Trailers, up to the blank line
+                while (await reader.readline()) not in [b'\r\n', b'\n', b'']:
+                    pass
+                break
+            await reader.readexactly(size + 2)
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers.get('content-length')))
+    else:
+        # The body ends with the connection
+        await reader.read()
+        keep_alive = False
+    return int(status), keep_alive
+
+
+def percentile(values, p):
+    """
+    Gets the nearest rank percentile
+
+    :param values: Sorted values
+    :param p: Percentile between 0 and 100
+    :return: Value
+    """
+    rank = max(1, -(-len(values) * p // 100))
+    return values[int(rank) - 1]
+
+
+def get_free_port():
+    """
+    Gets a free local port
+
+    :return: Port number
+    """
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
@@ -1,68 +1,332 @@
+import hashlib
+import json
 import os
+import shutil
 import subprocess
 import sys
+import tempfile
 
 import click
 from termcolor import colored
 
+from boom.utils.cache_helper import get_cache_dir
 from boom.utils.path_helper import valid_directory
+from boom.utils.requirements_helper import find_site_packages, parse_requirement_names, resolve_pins, wheel_name
+from boom.utils.trace_helper import traced
+
+SNAPSHOT_MARKER = 'boom-snapshot.json'
+# ioctl making a file share the blocks of another copy on write, on Linux file systems supporting it (btrfs, XFS)
+FICLONE = 0x40049409
 
 
 class PackageHandler:
     __ctx__ = None
     project_root = None
     verbose = 0
+    use_snapshots = True
 
-    def __init__(self, ctx, project_root, verbose=0) -> None:
+    def __init__(self, ctx, project_root, verbose=0, use_snapshots=True) -> None:
         self.__ctx__ = ctx
         self.project_root = project_root
         self.verbose = verbose
+        self.use_snapshots = use_snapshots
 
         if not valid_directory(project_root):
             ctx.fail(colored('Invalid project directory when setting up packages', 'red', attrs=['bold']))
 
+    @traced('start_venv')
     def start_venv(self):
-        self.create_venv()
+        snapshot_key = self.get_snapshot_key() if self.use_snapshots else None
+        if snapshot_key is not None and self.clone_venv_snapshot(snapshot_key):
+            self.update_requirements_versions()
+            return
+        created = self.create_venv()
         self.install_packages()
+        # A reused venv may hold other packages, it must not become the snapshot of the requirements
+        if snapshot_key is not None and created:
+            self.save_venv_snapshot(snapshot_key)
         self.update_requirements_versions()
 
-    def create_venv(self):
+    def get_snapshot_key(self):
+        """
+        Gets the key of the venv snapshot for the project requirements
+
+        Snapshots are keyed by the requirements (as rendered from the template, before versions are pinned) and the
+        Python used to create the venv.
+
+        :return: Snapshot key or None if the project has no requirements file
+        """
+        req_path = os.path.join(self.project_root, 'requirements.txt')
+        if not os.path.exists(req_path):
+            return None
+        key = hashlib.sha256()
+        with open(req_path, 'rb') as f:
+            key.update(f.read())
+        key.update(('\0%s\0%s\0%s' % (sys.version, sys.platform, os.path.realpath(sys.executable))).encode())
+        return key.hexdigest()[:32]
+
+    @traced('clone_venv_snapshot')
+    def clone_venv_snapshot(self, snapshot_key) -> bool:
+        """
+        Clones the venv snapshot into the project
+
+        Files are copied, copy on write where the file system supports it, never hardlinked: pip and Python write to
+        installed files in place, which would change the snapshot and every venv cloned from it. Files referencing the
+        snapshot's original location are rewritten for the project venv.
+
+        :param snapshot_key: Snapshot key
+        :return bool: If the snapshot was cloned
+        """
+        snapshot_dir = os.path.join(get_cache_dir('venvs'), snapshot_key)
+        venv_dir = os.path.join(self.project_root, 'venv')
+        if not os.path.exists(os.path.join(snapshot_dir, SNAPSHOT_MARKER)) or os.path.exists(venv_dir):
+            return False
+        click.secho('########### Cloning Virtual Environment ###########', fg='cyan')
+        try:
+            with open(os.path.join(snapshot_dir, SNAPSHOT_MARKER), 'r') as f:
+                snapshot_prefix = json.loads(f.read()).get('prefix')
+            shutil.copytree(snapshot_dir, venv_dir, symlinks=True, copy_function=clone_file,
+                            ignore=shutil.ignore_patterns(SNAPSHOT_MARKER))
+            relocate_venv(venv_dir, snapshot_prefix)
+        except (OSError, ValueError) as e:
+            if self.verbose >= 1:
+                click.secho('Failed to clone venv snapshot, creating venv: %s' % e, fg='yellow')
+            shutil.rmtree(venv_dir, ignore_errors=True)
+            return False
+        click.secho('Virtual Environment Cloned Successfully in venv', fg='green')
+        return True
+
+    @traced('save_venv_snapshot')
+    def save_venv_snapshot(self, snapshot_key):
+        """
+        Saves the project venv as the snapshot for its requirements
+
+        :param snapshot_key: Snapshot key
+        """
+        snapshots_dir = get_cache_dir('venvs')
+        snapshot_dir = os.path.join(snapshots_dir, snapshot_key)
+        venv_dir = os.path.join(self.project_root, 'venv')
+        if os.path.exists(snapshot_dir):
+            return
+        if self.verbose >= 1:
+            click.secho('Saving venv snapshot %s' % snapshot_key, fg='yellow')
+        tmp_dir = tempfile.mkdtemp(dir=snapshots_dir, prefix='.%s-' % snapshot_key)
+        try:
+            shutil.copytree(venv_dir, os.path.join(tmp_dir, 'venv'), symlinks=True)
+            with open(os.path.join(tmp_dir, 'venv', SNAPSHOT_MARKER), 'w') as f:
+                f.write(json.dumps({'prefix': venv_dir}))
+            # Only publish complete snapshots, another boom process may have saved the same snapshot meanwhile
+            os.rename(os.path.join(tmp_dir, 'venv'), snapshot_dir)
+        except OSError as e:
+            if self.verbose >= 1:
+                click.secho('Failed to save venv snapshot: %s' % e, fg='yellow')
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @traced('create_venv')
+    def create_venv(self) -> bool:
+        """
+        Creates the project venv, an existing venv is reused if it has the same Python version as boom
+
+        :return bool: If a new venv was created
+        """
         click.secho('########### Creating Virtual Environment ###########', fg='cyan')
+        venv_dir = os.path.join(self.project_root, 'venv')
+        python = os.path.join(venv_dir, 'bin', 'python')
+        args = [sys.executable, '-m', 'venv', venv_dir]
+        if os.path.exists(python):
+            version = self.get_python_version(python)
+            if version == tuple(sys.version_info[:3]):
+                click.secho('Reusing existing Virtual Environment in venv', fg='green')
+                return False
+            click.secho('Existing venv has Python %s instead of %s, recreating it' % (
+                '.'.join(map(str, version)) if version else 'unknown', '.'.join(map(str, sys.version_info[:3]))),
+                fg='yellow')
+            args.insert(3, '--clear')
 
         try:
-            subprocess.check_call([sys.executable, '-m', 'venv', '', os.path.join(self.project_root, 'venv')])
+            subprocess.check_call(args)
             click.secho('Virtual Environment Created Successfully in venv', fg='green')
         except subprocess.CalledProcessError as e:
             if self.verbose >= 2:
                 click.secho(e.__str__(), fg='yellow')
             self.__ctx__.fail(colored('Failed to create virtualenv.', 'red', attrs=['bold']))
+        return True
 
+    @staticmethod
+    def get_python_version(python):
+        """
+        Gets the version of a Python executable
+
+        :param python: Path to Python executable
+        :return: Tuple of major, minor and micro version or None if it does not run
+        """
+        try:
+            output = subprocess.run([python, '-c', 'import sys; print(*sys.version_info[:3])'], check=True,
+                                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, universal_newlines=True).stdout
+            return tuple(int(part) for part in output.split())
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            return None
+
+    @traced('pip_install')
     def install_packages(self):
-        if not os.path.exists(os.path.join(self.project_root, 'requirements.txt')):
+        """
+        Installs the project requirements into the venv
+
+        Packages are installed offline from the shared wheelhouse when it has every requirement, otherwise the
+        wheelhouse is filled first so the next project using the same requirements is installed offline.
+        """
+        req_path = os.path.join(self.project_root, 'requirements.txt')
+        if not os.path.exists(req_path):
             click.secho('No Requirements to install', fg='cyan')
-        req = open(os.path.join(self.project_root, 'requirements.txt'), "r").read()
-        if len(req) == 0:
+            return
+        with open(req_path, "r") as f:
+            req = f.read()
+        if len(parse_requirement_names(req.split('\n'))) == 0:
             click.secho('No Requirements to install', fg='cyan')
+            return
 
         click.secho('########### Installing Requirements ###########', fg='cyan')
+        python = os.path.join(self.project_root, 'venv', 'bin', 'python')
+        wheelhouse = self.get_wheelhouse()
+        offline_install = [python, '-m', 'pip', 'install', '--no-index', '--find-links', wheelhouse, '-r', req_path]
         try:
-            subprocess.check_call(
-                [os.path.join(self.project_root, 'venv', 'bin', 'python'), '-m', 'pip', 'install', '-r',
-                 os.path.join(self.project_root, 'requirements.txt')])
+            if self.wheelhouse_has(req.split('\n')):
+                try:
+                    subprocess.check_call(offline_install)
+                    click.secho('Requirements installed from wheelhouse', fg='green')
+                    return
+                except subprocess.CalledProcessError as e:
+                    # Usually a dependency of a requirement is missing, fill the wheelhouse and try again
+                    if self.verbose >= 1:
+                        click.secho('Wheelhouse is incomplete: %s' % e, fg='yellow')
+            try:
+                self.fill_wheelhouse(python, req_path, self.verbose)
+            except subprocess.CalledProcessError as e:
+                if self.verbose >= 1:
+                    click.secho('Failed to fill wheelhouse, installing directly: %s' % e, fg='yellow')
+                subprocess.check_call([python, '-m', 'pip', 'install', '-r', req_path])
+                return
+            subprocess.check_call(offline_install)
         except subprocess.CalledProcessError as e:
             if self.verbose >= 2:
                 click.secho(e.__str__(), fg='yellow')
             self.__ctx__.fail(colored('Failed to install requirements.', 'red', attrs=['bold']))
 
+    @staticmethod
+    def get_wheelhouse():
+        """
+        Gets the wheelhouse shared by all projects
+
+        :return: Path to wheelhouse directory
+        """
+        return get_cache_dir('wheelhouse')
+
+    @staticmethod
+    def wheelhouse_has(requirements) -> bool:
+        """
+        Checks if the wheelhouse has a wheel for every requirement
+
+        Only direct requirements are checked, pip reports missing dependencies when installing.
+
+        :param requirements: Lines of a requirements file
+        :return bool: If every requirement has a wheel
+        """
+        available = {wheel_name(filename) for filename in os.listdir(PackageHandler.get_wheelhouse())}
+        return all(name in available for name in parse_requirement_names(requirements))
+
+    @staticmethod
+    @traced('pip_wheel')
+    def fill_wheelhouse(python, req_path, verbose=0):
+        """
+        Builds (or downloads) wheels for requirements and their dependencies into the wheelhouse
+
+        :param python: Python executable whose pip builds the wheels
+        :param req_path: Path to requirements file
+        :param verbose: Verbosity level
+        :raises subprocess.CalledProcessError: If pip fails
+        """
+        if verbose >= 1:
+            click.secho('Filling wheelhouse from %s' % req_path, fg='yellow')
+        subprocess.check_call([python, '-m', 'pip', 'wheel', '--wheel-dir', PackageHandler.get_wheelhouse(),
+                               '--find-links', PackageHandler.get_wheelhouse(), '-r', req_path])
+
+    @traced('pin_requirements')
     def update_requirements_versions(self):
+        """
+        Pins the requirements file to the versions installed in the venv
+
+        Versions are read from the venv's package metadata, only the requirements and their dependencies are pinned.
+        """
         click.secho('########### Updating Requirements File ###########', fg='cyan')
-        if not os.path.exists(os.path.join(self.project_root, 'requirements.txt')):
+        req_path = os.path.join(self.project_root, 'requirements.txt')
+        if not os.path.exists(req_path):
             click.secho('Requirements file does not exist', fg='cyan')
+            return
+        site_packages = find_site_packages(os.path.join(self.project_root, 'venv'))
+        if len(site_packages) == 0:
+            self.__ctx__.fail(colored('Failed to update pip requirements. Could not find venv site-packages.', 'red',
+                                      attrs=['bold']))
+        with open(req_path, "r") as f:
+            requirements = f.read().split('\n')
+        pins = resolve_pins(requirements, site_packages)
+        with open(req_path, "w") as f:
+            f.write('\n'.join(pins) + '\n')
+        click.secho('Requirements File Updated', fg='green')
+
+
+def clone_file(source, target):
+    """
+    Copies a file, sharing its blocks copy on write (a reflink) where the file system supports it
+
+    :param source: Source file
+    :param target: Target file
+    """
+    if sys.platform.startswith('linux'):
+        import fcntl
+
         try:
-            req_file = open(os.path.join(self.project_root, 'requirements.txt'), "w")
-            subprocess.check_call([os.path.join(self.project_root, 'venv', 'bin', 'python'), '-m', 'pip', 'freeze'], stdout=req_file)
-            click.secho('Requirements File Updated', fg='green')
-        except subprocess.CalledProcessError as e:
-            if self.verbose >= 2:
-                click.secho(e.__str__(), fg='yellow')
-            self.__ctx__.fail(colored('Failed to update pip requirements.', 'red', attrs=['bold']))
+            with open(source, 'rb') as src, open(target, 'wb') as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            shutil.copystat(source, target)
+            return
+        except OSError:
+            pass
+    shutil.copy2(source, target)
+
+
+def relocate_venv(venv_dir, old_prefix):
+    """
+    Rewrites the files of a copied venv that reference its old location
+
+    These are the scripts, pyvenv.cfg, .pth files and the RECORD files listing the installed files of each package.
+
+    :param venv_dir: Venv directory
+    :param old_prefix: Directory the venv was created in
+    """
+    if not old_prefix or os.path.abspath(old_prefix) == os.path.abspath(venv_dir):
+        return
+    old_bytes = old_prefix.encode()
+    new_bytes = os.path.abspath(venv_dir).encode()
+    paths = [os.path.join(venv_dir, 'pyvenv.cfg')]
+    for scripts_dir in ('bin', 'Scripts'):
+        if os.path.isdir(os.path.join(venv_dir, scripts_dir)):
+            paths.extend(os.path.join(venv_dir, scripts_dir, f) for f in os.listdir(os.path.join(venv_dir, scripts_dir)))
+    for site_packages in find_site_packages(venv_dir):
+        for name in os.listdir(site_packages):
+            if name.endswith('.pth'):
+                paths.append(os.path.join(site_packages, name))
+            elif name.endswith('.dist-info'):
+                paths.append(os.path.join(site_packages, name, 'RECORD'))
+    for path in paths:
+        if os.path.islink(path) or not os.path.isfile(path):
+            continue
+        with open(path, 'rb') as f:
+            content = f.read()
+        if old_bytes not in content:
+            continue
+        mode = os.stat(path).st_mode
+        os.unlink(path)
+        with open(path, 'wb') as f:
+            f.write(content.replace(old_bytes, new_bytes))
+        os.chmod(path, mode)
@@ -1,81 +1,50 @@
 import json
 import os
 import re
+from functools import lru_cache
 from typing import Pattern
 
 import click
-import inflect
-from schema import SchemaError
 from termcolor import colored
 
 from boom.handlers.package_handler import PackageHandler
 from boom.handlers.structure_handler import StructureHandler
 from boom.handlers.template_handler import TemplateHandler
-from boom.schema.project_config import project_config_schema
+from boom.utils.hash_helper import hash_text_file
+from boom.utils.source_editor import SourceEditor, import_pattern
+from boom.utils.trace_helper import annotate, traced
 
-engine = inflect.engine()
+# Keys of project.boom.json kept by boom itself, they are not template variables
+SETTINGS_KEYS = ['files', 'modules']
 
 
-def find_last_line_of(start_index, match: Pattern or None, lines):
+@lru_cache(maxsize=None)
+@traced('load_inflect')
+def get_inflect_engine():
     """
-    Gets the last line of a matched pattern
+    Gets the shared inflect engine, creating it on first use as it is slow to import
 
-    :param start_index:
-    :param match: pattern
-    :param lines:
-    :return:
+    :return: inflect engine
     """
-    i = start_index + 1
-    if match is not None:
-        while match.match(lines[i]) or len(lines[i]) == 0:
-            i += 1
-    return i
+    import inflect
+    return inflect.engine()
 
 
 def write_at_marker(lines, line_to_write, match: Pattern or None = None, marker=None, not_exists=True):
     if isinstance(lines, list):
-        if marker is None:
-            line_index = find_last_line_of(0, match, lines)
-        else:
-            marker_idx = [i for i, line in enumerate(lines) if marker in line]
-            # Marker found
-            if len(marker_idx) > 0:
-                if not_exists:
-                    exists = [i for i, line in enumerate(lines) if line_to_write in line]
-                    if len(exists) != 0:
-                        return 'exists'
-                marker_idx = marker_idx[0]
-                line_index = find_last_line_of(marker_idx, match, lines)
-            else:
-                return 'not_found'
-        # Insert at index
-        lines.insert(line_index, line_to_write + '\n')
+        editor = SourceEditor(lines)
+        result = editor.write_at_marker(line_to_write, match=match, marker=marker, not_exists=not_exists)
+        if result is not None:
+            return result
+        editor.apply()
     return lines
 
 
 def import_module(lines: list, module, prefix=''):
     if isinstance(lines, list):
-        marker_idx = [i for i, line in enumerate(lines) if re.compile('^(.*)import(.*)$').match(line)]
-        if len(marker_idx) > 0:
-            marker_idx = marker_idx[0] + 1
-        else:
-            marker_idx = 0
-        if prefix != '':
-            match = re.compile('^from ' + prefix + ' import (.*)$')
-            line = {i: line for i, line in enumerate(lines) if match.match(line)}
-            if len(line.keys()) != 0:
-                k = next(iter(line))
-                found_modules = match.search(line[k]).group(1).split(', ')
-                if module not in found_modules:
-                    found_modules.append(module)
-                    lines[k] = f"from {prefix} import {', '.join(found_modules)}\n"
-            else:
-                lines.insert(marker_idx, f"from {prefix} import {module}\n")
-        else:
-            line_to_write = f"import {module}"
-            exists = [i for i, line in enumerate(lines) if line_to_write in line]
-            if len(exists) == 0:
-                lines.insert(marker_idx, line_to_write)
+        editor = SourceEditor(lines)
+        editor.import_module(module, prefix)
+        editor.apply()
     return lines
 
 
@@ -97,12 +66,14 @@ class ProjectHandler:
     project_root = os.getcwd()
     project_config = {}
     project_template_config = {}
+    pending_edits = None
     verbose = 0
 
     def __init__(self, ctx, verbose=0):
         self.__ctx__ = ctx
         self.verbose = verbose
 
+    @traced('validate_project_config')
     def validate_and_set_config(self, root_vars):
         """
         Validates root vars
@@ -110,6 +81,8 @@ class ProjectHandler:
         Checks required vars and project root path
         :return bool: If valid
         """
+        from schema import SchemaError
+        from boom.schema.project_config import project_config_schema
 
         try:
             self.project_config = project_config_schema.validate(root_vars)
@@ -117,7 +90,8 @@ class ProjectHandler:
             self.__ctx__.fail(colored('Invalid Project Config: %s' % e, 'red',
                                       attrs=['bold']))
 
-    def create_project(self, project_root, root_vars):
+    @traced('create_project')
+    def create_project(self, project_root, root_vars, dry_run=False, keep_venv=False, fresh_venv=False):
         self.validate_and_set_config(root_vars)
 
         if project_root is not None:
@@ -125,26 +99,47 @@ class ProjectHandler:
 
         self.select_template(self.project_config.get('template').get('slug'))
 
-        structure_handler = StructureHandler(self.__ctx__, root_vars, self.project_root, self.verbose)
+        structure_handler = StructureHandler(self.__ctx__, root_vars, self.project_root, self.verbose, dry_run=dry_run,
+                                             keep=['venv'] if keep_venv else None)
         structure_handler.create_project_structure(self.project_template_config)
+        if dry_run:
+            return
 
+        self.project_config.update(files=structure_handler.file_hashes)
         self.save_project_settings()
 
-        package_handler = PackageHandler(self.__ctx__, self.project_root, self.verbose)
+        package_handler = PackageHandler(self.__ctx__, self.project_root, self.verbose, use_snapshots=not fresh_venv)
 
         # Create project venv
         package_handler.start_venv()
 
+    @traced('save_project_settings')
     def save_project_settings(self):
         click.secho('########### Saving Project Settings ###########', fg='cyan')
         project_settings = self.project_config
         project_settings.update(template={"slug": self.project_template_config.get('slug')})
+        self.write_project_settings(project_settings)
+        click.secho('Saved Project Settings to project.boom.json', fg='green')
+
+    def write_project_settings(self, project_settings):
         with open(os.path.join(self.project_root, 'project.boom.json'), "w") as f:
             f.write(json.dumps(project_settings))
             f.close()
-        click.secho('Saved Project Settings to project.boom.json', fg='green')
 
+    def get_template_vars(self):
+        """
+        Gets the variables the project was rendered with from the loaded project settings
+
+        :return: Dict of template variables
+        """
+        template_vars = {key: value for key, value in ProjectHandler.project_config.items() if key not in SETTINGS_KEYS}
+        template_vars.update(template=self.project_template_config)
+        return template_vars
+
+    @traced('select_template')
     def select_template(self, template_slug):
+        from schema import SchemaError
+
         template_handler = TemplateHandler(self.__ctx__, self.verbose)
         try:
             self.project_template_config = template_handler.get_config_for_slug(template_slug)
@@ -153,6 +148,7 @@ class ProjectHandler:
             self.__ctx__.fail(colored('Invalid Template config: %s' % e, 'red',
                                       attrs=['bold']))
 
+    @traced('load_project')
     def load_project(self, project_root):
         if project_root is not None:
             self.project_root = os.path.abspath(project_root)
@@ -171,34 +167,133 @@ class ProjectHandler:
         self.select_template(ProjectHandler.project_config.get('template').get('slug'))
 
     def generate_module(self, module, name: str, model=None):
+        self.generate_modules([{'module': module, 'name': name, 'model': model}])
+
+    @traced('generate_modules')
+    def generate_modules(self, modules):
+        """
+        Generates modules in the loaded project
+
+        The project and template are loaded once for all modules and the registrations of every module are applied to
+        each target file in a single read and write.
+
+        :param modules: List of dicts with module, name and optionally model
+        """
         if self.project_root is None:
             self.__ctx__.fail(colored('Could not load project', 'red', attrs=['bold']))
         if self.project_template_config is None:
             self.__ctx__.fail(colored('Could not load project template', 'red', attrs=['bold']))
+        # Nothing is written unless every module can be generated, so a batch never stops half way
+        self.validate_modules(modules)
+        structure_handler = StructureHandler(self.__ctx__, self.get_template_vars(), self.project_root,
+                                             self.verbose)
+        for module in modules:
+            self.__generate_module__(structure_handler, module.get('module'), module.get('name'), module.get('model'))
+        edited = self.apply_edits()
+        annotate(modules=len(modules))
+        self.record_modules(modules, structure_handler.file_hashes, edited)
+        click.secho('Generation Complete', fg='green', bold=True)
+
+    def validate_modules(self, modules):
+        """
+        Checks the module template and model of every module exist before any module is generated
+
+        A model may be a module generated earlier in the same batch.
+
+        :param modules: List of dicts with module, name and optionally model
+        """
+        type = self.project_template_config.get('type', 'app')
+        planned = []
+        for module in modules:
+            name, prefix = self.split_module_name(module.get('name'))
+            input_module_path, output_module_path = self.__get_module_paths__(type, module.get('module'), name, prefix)
+            if not TemplateHandler.is_dir(input_module_path):
+                self.__ctx__.fail(colored('Unknown module: %s' % module.get('module'), 'red', attrs=['bold']))
+            if module.get('model') is not None:
+                model_path = self.get_model_path(module.get('model'))
+                if not os.path.exists(model_path) and model_path not in planned:
+                    self.__ctx__.fail(colored('Model does not exist at path: %s' % model_path, 'red',
+                                              attrs=['bold']))
+            planned.append(os.path.normpath(output_module_path))
+
+    def record_modules(self, modules, file_hashes, edited):
+        """
+        Records generated modules and the hashes of their files in project.boom.json so they can be synced
+
+        :param modules: List of dicts with module, name and optionally model
+        :param file_hashes: Dict of path relative to the project root to file hashes
+        :param edited: Files edited to register the modules
+        """
+        project_settings = ProjectHandler.project_config
+        recorded = project_settings.setdefault('modules', [])
+        for module in modules:
+            module = {'module': module.get('module'), 'name': module.get('name'), 'model': module.get('model')}
+            if module not in recorded:
+                recorded.append(module)
+        project_settings.setdefault('files', {}).update(file_hashes)
+        self.record_edits(project_settings.get('files'), edited)
+        self.write_project_settings(project_settings)
+
+    @traced('sync_project')
+    def sync_project(self, force=False):
+        """
+        Renders the template files of the loaded project and its generated modules again
+
+        Only files whose template or variables changed since they were written are rendered. Files changed since boom
+        last wrote them are reported instead of overwritten, unless forced.
+
+        :param force: Overwrite changed files
+        :return: Dict of status to list of paths relative to the project root
+        """
+        click.secho('########### Syncing Project ###########', fg='cyan')
+        type = self.project_template_config.get('type', 'app')
+        recorded = ProjectHandler.project_config.get('files', {})
+        structure_handler = StructureHandler(self.__ctx__, self.get_template_vars(), self.project_root, self.verbose)
+        files = []
+        structure_handler.plan_files_for_dir(self.project_template_config.get('abs_dir'), self.project_root, files,
+                                             root=True, type=type, merge=True)
+        report = {}
+        self.__sync_files__(structure_handler, files, recorded, force, report)
+        for module in ProjectHandler.project_config.get('modules', []):
+            module_vars, name, prefix = self.__get_module_vars__(module.get('module'), module.get('name'),
+                                                                 module.get('model'))
+            structure_handler.root_vars = module_vars
+            input_module_path, output_module_path = self.__get_module_paths__(type, module.get('module'), name, prefix)
+            if not TemplateHandler.is_dir(input_module_path):
+                click.secho('Skipping unknown module: %s' % module.get('module'), fg='yellow')
+                continue
+            files = []
+            if type == 'app':
+                structure_handler.create_dir_if_does_not_exist(output_module_path)
+                structure_handler.plan_files_for_dir(input_module_path, output_module_path, files, merge=True)
+                self.register_app(name, os.path.dirname(output_module_path))
+            else:
+                source_path = os.path.join(input_module_path, f"{module.get('module')}.py")
+                if not TemplateHandler.exists(source_path):
+                    source_path += '.jinja2'
+                files.append((source_path, os.path.join(output_module_path, f'{name}.py')))
+                self.register_function(name, module.get('module'), output_module_path,
+                                       module_vars.get('module_name_plural'))
+            self.__sync_files__(structure_handler, files, recorded, force, report)
+
+        # Register the modules again in files that were rendered from the template again
+        written = [os.path.abspath(os.path.join(self.project_root, rel_path))
+                   for status in ['created', 'updated'] for rel_path in report.get(status, [])]
+        files = {**recorded, **structure_handler.file_hashes}
+        self.record_edits(files, self.apply_edits(paths=written))
+        ProjectHandler.project_config.update(files=files)
+        self.write_project_settings(ProjectHandler.project_config)
+        annotate(**{status: len(paths) for status, paths in report.items()})
+        return report
+
+    @traced('generate_module')
+    def __generate_module__(self, structure_handler, module, name: str, model=None):
         click.secho('########### Generating Module [%s] ###########' % name, fg='cyan')
         type = self.project_template_config.get('type', 'app')
-        structure_handler = StructureHandler(self.__ctx__, ProjectHandler.project_config, self.project_root,
-                                             self.verbose)
-        prefix = ''
-        if '/' in name:
-            splits = name.split('/')
-            name = splits[-1]
-            prefix = '.'.join(splits[:-1])
-        # Add extra variables
-        if model is not None:
-            model_path = os.path.join(ProjectHandler.project_config.get('project_name_path'), model)
-            if not os.path.exists(model_path):
-                self.__ctx__.fail(colored('Model does not exist at path: %s' % model_path, 'red', attrs=['bold']))
-                return
-            m = model.split('/')
-            structure_handler.root_vars.update(module_model=m[-1])
-            structure_handler.root_vars.update(module_model_path='.'.join(m))
-        structure_handler.root_vars.update(module_prefix=prefix)
-        structure_handler.root_vars.update(module_name=name)
-        structure_handler.root_vars.update(module_name_plural=engine.plural(name))
+        structure_handler.root_vars, name, prefix = self.__get_module_vars__(module, name, model)
         # Paths
         input_module_path, output_module_path = self.__get_module_paths__(type, module, name, prefix)
-        if not os.path.exists(input_module_path):
+        if not TemplateHandler.is_dir(input_module_path):
             self.__ctx__.fail(colored('Unknown module: %s' % module, 'red', attrs=['bold']))
         structure_handler.create_dir_if_does_not_exist(output_module_path)
         structure_handler.empty_if_not(output_module_path)
@@ -209,12 +304,64 @@ class ProjectHandler:
             self.register_app(name, os.path.dirname(output_module_path))
         else:
             source_path = os.path.join(input_module_path, f'{module}.py')  # E.g. route.py
-            if not os.path.exists(source_path):
+            if not TemplateHandler.exists(source_path):
                 source_path += '.jinja2'
             structure_handler.create_file(source_path, os.path.join(output_module_path, f'{name}.py'))
             self.register_function(name, module, output_module_path,
                                    structure_handler.root_vars.get('module_name_plural'))
-        click.secho('Generation Complete', fg='green', bold=True)
+
+    @staticmethod
+    def __sync_files__(structure_handler, files, recorded, force, report):
+        statuses = structure_handler.map_files(structure_handler.sync_file, files, recorded, force)
+        for (_, target_file_path), status in zip(files, statuses):
+            report.setdefault(status, []).append(structure_handler.get_relative_path(target_file_path))
+
+    def __get_module_vars__(self, module, name: str, model=None):
+        """
+        Gets the template variables of a module
+
+        :param module: Module template
+        :param name: Module name, optionally prefixed by its parent modules, e.g. admin/users
+        :param model: Path of model relative to the project package
+        :return: template_vars, name, prefix
+        """
+        template_vars = self.get_template_vars()
+        name, prefix = self.split_module_name(name)
+        # Add extra variables
+        if model is not None:
+            model_path = self.get_model_path(model)
+            if not os.path.exists(model_path):
+                self.__ctx__.fail(colored('Model does not exist at path: %s' % model_path, 'red', attrs=['bold']))
+            m = model.split('/')
+            template_vars.update(module_model=m[-1])
+            template_vars.update(module_model_path='.'.join(m))
+        template_vars.update(module_prefix=prefix)
+        template_vars.update(module_name=name)
+        template_vars.update(module_name_plural=get_inflect_engine().plural(name))
+        return template_vars, name, prefix
+
+    @staticmethod
+    def split_module_name(name: str):
+        """
+        Splits a module name from the names of its parent modules
+
+        :param name: Module name, optionally prefixed by its parent modules, e.g. admin/users
+        :return: name, prefix, e.g. users, admin
+        """
+        if '/' not in name:
+            return name, ''
+        splits = name.split('/')
+        return splits[-1], '.'.join(splits[:-1])
+
+    def get_model_path(self, model):
+        """
+        Gets the path of a model
+
+        :param model: Path of model relative to the project package
+        :return: Normalized absolute path
+        """
+        return os.path.normpath(os.path.join(self.project_root, ProjectHandler.project_config.get('project_name_path'),
+                                             model))
 
     def __get_module_paths__(self, template_type, module, name, prefix):
         """
@@ -227,9 +374,9 @@ class ProjectHandler:
         """
         prefix = '/'.join(prefix.split('.')) if template_type == 'app' else ''
         return os.path.join(self.project_template_config.get('abs_dir'), 'project',
-                            module if template_type == 'app' else engine.plural(module)), \
+                            module if template_type == 'app' else get_inflect_engine().plural(module)), \
                os.path.join(self.project_root, ProjectHandler.project_config.get('project_name_path'),
-                            prefix, name if template_type == 'app' else engine.plural(module))
+                            prefix, name if template_type == 'app' else get_inflect_engine().plural(module))
 
     def __get_module_from_path__(self, path):
         return '.'.join(os.path.relpath(path, self.project_root).split('/'))
@@ -241,18 +388,21 @@ class ProjectHandler:
             init_path = os.path.join(module_path, '__init__.py')
             while not os.path.exists(init_path):
                 init_path = os.path.abspath(os.path.join(os.path.dirname(init_path), '..', '__init__.py'))
-            # Open target project base init func
-            with open(init_path, "r+") as f:
-                lines = f.readlines()
-                new_lines = write_at_marker(lines, line_to_write=f"    {name}.{init_func}",
-                                            match=re.compile(f'^(.*){init_func}(.*)$'), marker='[b] Apps')
-                new_lines = import_module(new_lines, name, self.__get_module_from_path__(module_path))
-                write_lines_to_file(new_lines, f)
+            import_prefix = self.__get_module_from_path__(module_path)
 
-    @staticmethod
-    def register_function(name, module, module_path, module_plural=None):
+            # Edit target project base init func
+            def edit(editor):
+                status = editor.write_at_marker(line_to_write=f"    {name}.{init_func}",
+                                                match=re.compile(f'^(.*){init_func}(.*)$'), marker='[b] Apps')
+                if status is None:
+                    editor.import_module(name, import_prefix)
+                return status
+
+            self.queue_edit(init_path, edit)
+
+    def register_function(self, name, module, module_path, module_plural=None):
         if module_plural is None:
-            module_plural = engine.plural(module)
+            module_plural = get_inflect_engine().plural(module)
         # Register module
         if module == 'route':
             module_line = f'app.register_blueprint({module_plural})'
@@ -260,12 +410,61 @@ class ProjectHandler:
         else:
             return
 
-        # Open target project base init func
-        with open(os.path.join(module_path, '__init__.py'), "r+") as f:
-            lines = f.readlines()
-            new_lines = write_at_marker(lines, line_to_write=f"    {module_line}",
-                                        match=module_match, marker='[b] Apps')
-            new_lines = write_at_marker(new_lines,
-                                        line_to_write=f"from .{name} import {engine.plural(name)}",
-                                        match=re.compile('^(.*)import(.*)$'))
-            write_lines_to_file(new_lines, f)
+        # Edit target project base init func
+        def edit(editor):
+            status = editor.write_at_marker(line_to_write=f"    {module_line}", match=module_match, marker='[b] Apps')
+            if status is None:
+                editor.write_at_marker(line_to_write=f"from .{name} import {get_inflect_engine().plural(name)}",
+                                       match=import_pattern)
+            return status
+
+        self.queue_edit(os.path.join(module_path, '__init__.py'), edit)
+
+    def queue_edit(self, path, edit):
+        """
+        Queues an edit of a source file, applied with the other edits of the file by apply_edits
+
+        :param path: Path of file to edit
+        :param edit: Function taking a SourceEditor of the file and returning None, or a status if not applied
+        """
+        if self.pending_edits is None:
+            self.pending_edits = {}
+        self.pending_edits.setdefault(os.path.abspath(path), []).append(edit)
+
+    @traced('apply_edits')
+    def apply_edits(self, paths=None):
+        """
+        Applies the queued edits, reading, indexing and writing each file once
+
+        :param paths: Only apply the edits of these files, the edits of other files are dropped
+        :return: List of the files written
+        """
+        pending_edits, self.pending_edits = self.pending_edits or {}, None
+        written = []
+        for path, edits in pending_edits.items():
+            if paths is not None and path not in paths:
+                continue
+            with open(path, "r+") as f:
+                editor = SourceEditor(f.readlines())
+                for edit in edits:
+                    status = edit(editor)
+                    if status is not None:
+                        # Reports why the edit was not applied
+                        write_lines_to_file(status, f)
+                if editor.changed:
+                    write_lines_to_file(editor.apply(), f)
+                    written.append(path)
+        annotate(files=len(written))
+        return written
+
+    def record_edits(self, files, paths):
+        """
+        Updates the recorded content hashes of edited files, so sync does not take the edits for user changes
+
+        :param files: Dict of path relative to the project root to file hashes
+        :param paths: Edited files
+        """
+        for path in paths:
+            rel_path = os.path.relpath(path, self.project_root).replace(os.sep, '/')
+            if rel_path in files:
+                files[rel_path] = dict(files.get(rel_path), output=hash_text_file(path))
@@ -0,0 +1,276 @@
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+import click
+from termcolor import colored
+
+# Possible start files, in order of preference
+START_FILES = ['app.py', 'application.py', 'server.py', 'flask.py']
+# Same default bind address as gunicorn
+DEFAULT_BIND = '127.0.0.1:8000'
+DEFAULT_GRACEFUL_TIMEOUT = 30
+# Directories never watched for changes
+DEFAULT_WATCH_IGNORE = ['venv', '.git', '__pycache__']
+# Seconds without changes before a burst of changes is handled
+DEFAULT_DEBOUNCE = 0.3
+WATCH_EVENTS = ['created', 'modified', 'moved', 'deleted']
+
+
+class ServerHandler:
+    """
+    Server Handler class
+
+    Runs the project's flask app, with the flask development server or a pre-fork gunicorn server
+    """
+    __ctx__ = None
+    project_root = os.getcwd()
+    verbose: int = 0
+
+    def __init__(self, ctx, project_root=None, verbose=0) -> None:
+        """
+        Initialises handler with context, project root and verbosity
+
+        :param ctx: Click context
+        :param project_root: Project root, defaults to the current directory
+        :param verbose: Verbosity level
+        """
+        self.__ctx__ = ctx
+        self.project_root = os.path.abspath(project_root or os.getcwd())
+        self.verbose = verbose
+
+    def find_start_file(self, start_file=None):
+        """
+        Finds the file creating the flask app
+
+        :param start_file: File given on the command line, .py is added if missing
+        :return: Name of start file or None if not found
+        """
+        if start_file is not None:
+            if not start_file.endswith('.py'):
+                start_file += '.py'
+            return start_file
+        dir_files = os.listdir(self.project_root)
+        return next((start_file for start_file in START_FILES if start_file in dir_files), None)
+
+    def get_python(self):
+        """
+        Gets the python executable to run the app with, preferring the project venv
+
+        :return: Path to python executable
+        """
+        bin_dir = 'Scripts' if sys.platform == 'win32' else 'bin'
+        venv_python = os.path.join(self.project_root, 'venv', bin_dir, 'python')
+        if os.path.exists(venv_python) or os.path.exists(venv_python + '.exe'):
+            return venv_python
+        return shutil.which('python') or sys.executable
+
+    def start_dev(self, start_file):
+        """
+        Runs the start file with the flask development server
+
+        :param start_file: Name of start file
+        """
+        env = dict(os.environ, FLASK_ENV='development')
+        try:
+            subprocess.call([self.get_python(), start_file], cwd=self.project_root, env=env)
+        except KeyboardInterrupt:
+            pass
+
+    def start_prod(self, start_file, app_name='app', workers=None, threads=None, bind=None,
+                   graceful_timeout=DEFAULT_GRACEFUL_TIMEOUT):
+        """
+        Replaces boom with a gunicorn server running the app
+
+        The app is imported once before the workers are forked (--preload) so they share its memory copy on write.
+        Send SIGHUP to the printed process id to gracefully restart the workers. As the app is preloaded, code changes
+        need SIGUSR2 to start a new master alongside the old one, then SIGQUIT to the old master.
+
+        :param start_file: Name of start file
+        :param app_name: Name of the flask app in the start file
+        :param workers: Number of worker processes, defaults to the number of CPUs
+        :param threads: Number of threads per worker, defaults to the number of CPUs
+        :param bind: Address to listen on
+        :param graceful_timeout: Seconds workers are given to finish their requests when restarting or stopping
+        """
+        python = self.get_python()
+        self.check_gunicorn(python)
+        args = self.get_gunicorn_args(python, start_file, app_name=app_name, workers=workers, threads=threads,
+                                      bind=bind, graceful_timeout=graceful_timeout)
+        if self.verbose >= 1:
+            click.secho(' '.join(args), fg='yellow')
+        click.secho('Starting gunicorn (pid %d), send SIGHUP to gracefully restart the workers' % os.getpid(),
+                    fg='green')
+        sys.stdout.flush()
+        os.chdir(self.project_root)
+        os.execve(python, args, dict(os.environ, FLASK_ENV='production'))
+
+    def check_gunicorn(self, python):
+        """
+        Fails if gunicorn is not installed for the python executable
+
+        :param python: Path to python executable
+        """
+        try:
+            subprocess.check_call([python, '-c', 'import gunicorn'], stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL)
+        except (OSError, subprocess.CalledProcessError):
+            self.__ctx__.fail(colored('gunicorn is not installed in %s. Install it with: %s -m pip install gunicorn' % (
+                python, python), 'red', attrs=['bold']))
+
+    def get_gunicorn_args(self, python, start_file, app_name='app', workers=None, threads=None, bind=None,
+                          graceful_timeout=DEFAULT_GRACEFUL_TIMEOUT):
+        """
+        Gets the command line running the app with a preloaded gunicorn server
+
+        :param python: Path to python executable
+        :param start_file: Name of start file
+        :param app_name: Name of the flask app in the start file
+        :param workers: Number of worker processes, defaults to the number of CPUs
+        :param threads: Number of threads per worker, defaults to the number of CPUs
+        :param bind: Address to listen on
+        :param graceful_timeout: Seconds workers are given to finish their requests when restarting or stopping
+        :return: List of arguments
+        """
+        cpus = os.cpu_count() or 1
+        return [python, '-m', 'gunicorn',
+                '--workers', str(workers or cpus),
+                '--threads', str(threads or cpus),
+                '--bind', bind or DEFAULT_BIND,
+                '--graceful-timeout', str(graceful_timeout),
+                '--preload',
+                '--chdir', self.project_root,
+                '%s:%s' % (os.path.splitext(start_file)[0].replace(os.sep, '.'), app_name)]
+
+    def start_watch(self, start_file, ignore=None, debounce=DEFAULT_DEBOUNCE):
+        """
+        Runs the app with the flask development server and restarts it when python files change
+
+        Changes are watched with the file system's events (inotify on Linux) through the optional watchdog package,
+        instead of polling every file. The server runs in debug mode without its own reloader, templates and static
+        files are read fresh by flask so only python changes restart it.
+
+        :param start_file: Name of start file
+        :param ignore: Names of directories to ignore on top of DEFAULT_WATCH_IGNORE
+        :param debounce: Seconds without changes before a burst of changes is handled
+        """
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            self.__ctx__.fail(colored('--watch needs the watchdog package. Install it with: pip install watchdog',
+                                      'red', attrs=['bold']))
+            return
+        ignore = set(DEFAULT_WATCH_IGNORE) | set(ignore or [])
+        changes = ChangeCollector(self.project_root, ignore)
+
+        class Handler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # Reading files, e.g. when the server imports them, and directory listings changing are not changes
+                if event.event_type not in WATCH_EVENTS or (event.is_directory and event.event_type == 'modified'):
+                    return
+                for path in [event.src_path, getattr(event, 'dest_path', None)]:
+                    if path:
+                        changes.add(os.fsdecode(path))
+
+        observer = Observer()
+        # Ignored top level directories (e.g. venv) are not watched at all, deeper ones are filtered out
+        observer.schedule(Handler(), self.project_root, recursive=False)
+        for entry in os.scandir(self.project_root):
+            if entry.is_dir() and entry.name not in ignore:
+                observer.schedule(Handler(), entry.path, recursive=True)
+        observer.start()
+
+        env = dict(os.environ, FLASK_APP=start_file, FLASK_ENV='development', FLASK_DEBUG='1')
+        args = [self.get_python(), '-m', 'flask', 'run', '--no-reload']
+        process = None
+        try:
+            while True:
+                if process is None:
+                    process = subprocess.Popen(args, cwd=self.project_root, env=env)
+                changed = changes.wait(debounce)
+                python_changes = [path for path in changed if path.endswith('.py')]
+                if self.verbose >= 2:
+                    for path in changed:
+                        click.secho('Changed %s' % os.path.relpath(path, self.project_root), fg='yellow')
+                if python_changes:
+                    click.secho('Restarting, %s changed' % ', '.join(
+                        os.path.relpath(path, self.project_root) for path in python_changes[:3]), fg='cyan')
+                    self.stop_process(process)
+                    process = None
+        except KeyboardInterrupt:
+            pass
+        finally:
+            observer.stop()
+            if process is not None:
+                self.stop_process(process)
+            observer.join()
+
+    @staticmethod
+    def stop_process(process, timeout=5):
+        """
+        Stops a process, killing it if it does not exit in time
+
+        :param process: Popen process
+        :param timeout: Seconds to wait after asking it to terminate
+        """
+        if process.poll() is not None:
+            return
+        process.terminate()
+        try:
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+
+
+class ChangeCollector:
+    """
+    Change Collector class
+
+    Collects changed paths from the watcher thread and hands them over in debounced batches
+    """
+
+    def __init__(self, root, ignore) -> None:
+        """
+        :param root: Watched directory
+        :param ignore: Names of directories whose changes are ignored
+        """
+        self.root = root
+        self.ignore = ignore
+        self.condition = threading.Condition()
+        self.paths = set()
+        self.last_change = 0
+
+    def add(self, path):
+        """
+        Adds a changed path unless it is inside an ignored directory
+
+        :param path: Absolute path of changed file or directory
+        """
+        rel_parts = os.path.relpath(path, self.root).split(os.sep)
+        if any(part in self.ignore for part in rel_parts):
+            return
+        with self.condition:
+            self.paths.add(path)
+            self.last_change = time.monotonic()
+            self.condition.notify()
+
+    def wait(self, debounce):
+        """
+        Waits for changes, then until there have been none for debounce seconds
+
+        :param debounce: Quiet period in seconds
+        :return: Set of changed paths
+        """
+        with self.condition:
+            while not self.paths:
+                # Wakes up regularly so KeyboardInterrupt is handled promptly
+                self.condition.wait(1)
+            while time.monotonic() - self.last_change < debounce:
+                self.condition.wait(debounce - (time.monotonic() - self.last_change))
+            paths, self.paths = self.paths, set()
+        return paths
@@ -1,12 +1,26 @@
+import hashlib
 import json
 import os
 import shutil
+import subprocess
+import sys
+import tempfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 import click
 from termcolor import colored
 
 from boom.handlers.template_handler import TemplateHandler
-from boom.utils.path_helper import is_pathname_valid, is_path_creatable, valid_directory
+from boom.utils.hash_helper import hash_file, hash_fileobj, hash_text, hash_text_file, hash_vars
+from boom.utils.path_helper import PathValidator, is_path_creatable, valid_directory
+from boom.utils.trace_helper import annotate, traced
+
+# Same default as ThreadPoolExecutor, rendering is CPU bound but writes can wait on slow file systems
+DEFAULT_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+# Templates of at least this many bytes are rendered in chunks of about STREAM_CHUNK_SIZE characters
+STREAM_THRESHOLD = 1 << 20
+STREAM_CHUNK_SIZE = 1 << 16
 
 
 class StructureHandler:
@@ -19,20 +33,41 @@ class StructureHandler:
     root_vars: dict = {}
     project_root = os.getcwd()
     verbose: int = 0
+    workers: int = DEFAULT_WORKERS
+    dry_run: bool = False
+    path_validator: PathValidator = None
+    keep: set = set()
+    output_root: str = None
+    file_hashes: dict = None
+    source_hashes: dict = None
+    template_keys: dict = None
 
-    def __init__(self, ctx, root_vars: object, project_root: str, verbose=0) -> None:
+    def __init__(self, ctx, root_vars: object, project_root: str, verbose=0, workers=None, dry_run=False,
+                 keep=None) -> None:
         """
         Initialises Handler with context, vars and verbosity
 
         :param ctx: Click context
         :param root_vars: Variables
         :param verbose: Verbosity level
+        :param workers: Number of threads used to render and write files
+        :param dry_run: Render files in memory only, nothing is written to disk
+        :param keep: Names of entries in the project root kept when it is overwritten, e.g. venv
         """
 
         self.__ctx__ = ctx
         self.root_vars = root_vars
         self.project_root = project_root
         self.verbose = verbose
+        self.dry_run = dry_run
+        self.path_validator = PathValidator()
+        self.keep = set(keep or [])
+        self.output_root = project_root
+        self.file_hashes = {}
+        self.source_hashes = {}
+        self.template_keys = {}
+        if workers is not None:
+            self.workers = max(1, workers)
 
         if not self.validate_project_root():
             self.__ctx__.fail(
@@ -45,7 +80,7 @@ class StructureHandler:
         :return bool: If project root path exists or is creatable
         """
 
-        if not is_pathname_valid(self.project_root):
+        if not self.path_validator.is_pathname_valid(self.project_root):
             if self.verbose >= 1:
                 click.secho('Target is not a valid pathname.', fg='yellow')
             return False
@@ -61,9 +96,13 @@ class StructureHandler:
                 return False
         return True
 
+    @traced('create_project_structure')
     def create_project_structure(self, selected_template_config):
         """
         Generates project structure using the selected template
+
+        The project is rendered into a staging directory next to the project root and published with a rename once
+        every file has been written, so a failure never leaves a half written project behind.
         """
         # Ensure template is selected
         if not TemplateHandler.validate_template_config(selected_template_config):
@@ -71,16 +110,94 @@ class StructureHandler:
             return
 
         click.secho('########### Creating Project Structure ###########', fg='cyan')
-        # Create root directory if it doesn't already exist
-        self.create_project_root_if_does_not_exist()
+        if self.dry_run:
+            self.report_plan(selected_template_config)
+            return
+
+        # Confirm before doing any work if the existing project would be overwritten
+        self.confirm_overwrite(self.project_root)
+
+        parent_dir = os.path.dirname(self.project_root)
+        self.create_dir_if_does_not_exist(parent_dir)
+        staging_dir = tempfile.mkdtemp(prefix='.%s.boom-' % os.path.basename(self.project_root), dir=parent_dir)
+        self.path_validator.add_valid_dir(staging_dir)
+        self.output_root = staging_dir
+        try:
+            # mkdtemp creates the directory private to the user, give it the usual permissions
+            umask = os.umask(0)
+            os.umask(umask)
+            os.chmod(staging_dir, 0o777 & ~umask)
+
+            click.secho('Creating files and folders')
+            # Recursively create all files in directory
+            self.create_files_for_dir(selected_template_config.get('abs_dir'), staging_dir,
+                                      root=True, type=selected_template_config.get('type', 'app'))
+            self.publish_directory(staging_dir, self.project_root)
+        except BaseException:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        finally:
+            self.output_root = self.project_root
+
+    @traced('publish_directory')
+    def publish_directory(self, source_dir, target_dir):
+        """
+        Replaces target directory with source directory
+
+        Both must be on the same file system. The existing target is renamed aside and deleted in the background
+        after the source has been renamed into its place. Kept entries (e.g. venv) are moved over to the source first.
+
+        :param source_dir: Fully populated directory
+        :param target_dir: Directory to replace
+        """
+        if self.verbose >= 1:
+            click.secho('Publishing %s' % target_dir, fg='yellow')
+        if not os.path.exists(target_dir):
+            os.rename(source_dir, target_dir)
+            return
+        for filename in self.keep:
+            kept_path = os.path.join(target_dir, filename)
+            if os.path.lexists(kept_path) and not os.path.lexists(os.path.join(source_dir, filename)):
+                if self.verbose >= 1:
+                    click.secho('Keeping %s' % kept_path, fg='yellow')
+                try:
+                    os.rename(kept_path, os.path.join(source_dir, filename))
+                except OSError as e:
+                    if self.verbose >= 1:
+                        click.secho('Failed to keep %s. Reason: %s' % (kept_path, e), fg='yellow')
+        old_dir = tempfile.mkdtemp(prefix='.%s.boom-old-' % os.path.basename(target_dir),
+                                   dir=os.path.dirname(target_dir))
+        try:
+            os.rename(target_dir, os.path.join(old_dir, 'project'))
+        except OSError as e:
+            # E.g. target is a mount point, fall back to replacing its contents
+            if self.verbose >= 1:
+                click.secho('Could not move %s aside (%s), replacing contents instead' % (target_dir, e), fg='yellow')
+            os.rmdir(old_dir)
+            self.empty_directory(target_dir)
+            for filename in os.listdir(source_dir):
+                os.rename(os.path.join(source_dir, filename), os.path.join(target_dir, filename))
+            os.rmdir(source_dir)
+            return
+        os.rename(source_dir, target_dir)
+        self.delete_in_background(old_dir)
 
-        # Check if directory is not empty and empty if so
-        self.empty_if_not(self.project_root)
+    @traced('report_plan')
+    def report_plan(self, selected_template_config):
+        """
+        Renders the project in memory and reports what would be written
 
-        click.secho('Creating files and folders')
-        # Recursively create all files in directory
-        self.create_files_for_dir(selected_template_config.get('abs_dir'), self.project_root,
-                                  root=True, type=selected_template_config.get('type', 'app'))
+        :param selected_template_config: Template config
+        """
+        files = []
+        dirs = []
+        self.plan_files_for_dir(selected_template_config.get('abs_dir'), self.project_root, files, root=True,
+                                type=selected_template_config.get('type', 'app'), dirs=dirs)
+        sizes = self.create_files(files)
+        click.secho('Dry run, nothing has been written. Plan for %s:' % self.project_root)
+        for (_, target_file_path), size in zip(files, sizes):
+            click.secho('  %s (%d bytes)' % (os.path.relpath(target_file_path, self.project_root), size))
+        click.secho('%d directories, %d files, %d bytes' % (len(dirs), len(files), sum(sizes)), fg='green')
 
     def create_project_root_if_does_not_exist(self):
         """
@@ -98,19 +215,34 @@ class StructureHandler:
                 click.secho('Target directory does not exist, creating.', fg='yellow')
             os.makedirs(target_dir)
 
-    def empty_if_not(self, target_dir):
-        if len(os.listdir(target_dir)) > 0:
+    def confirm_overwrite(self, target_dir) -> bool:
+        """
+        Asks for confirmation (aborting otherwise) if the target directory is not empty
+
+        :param target_dir: Path of directory
+        :return bool: If target directory is not empty
+        """
+        if os.path.isdir(target_dir) and len(os.listdir(target_dir)) > 0:
             click.confirm(colored('The target directory is not empty, continuing with overwrite files. Do you want to '
                                   'continue?', 'red', attrs=['bold']), abort=True, err=True)
+            return True
+        return False
+
+    def empty_if_not(self, target_dir):
+        if self.confirm_overwrite(target_dir):
             click.secho('Emptying Directory')
 
             # Clear directory
             self.empty_directory(target_dir)
 
+    @traced('empty_directory')
     def empty_directory(self, target_dir):
         """
         Empty a directory
 
+        Entries are renamed into a trash directory next to the target, which is then deleted in the background, so
+        emptying does not wait on deleting large trees such as venv or node_modules. Entries in keep are left alone.
+
         :param target_dir: Path of directory to empty
         :return:
         """
@@ -123,12 +255,23 @@ class StructureHandler:
             return
         if self.verbose >= 1:
             click.secho('Emptying target directory', fg='yellow')
+        trash_dir = tempfile.mkdtemp(prefix='.%s.boom-trash-' % os.path.basename(target_dir),
+                                     dir=os.path.dirname(os.path.abspath(target_dir)))
         for filename in os.listdir(target_dir):
+            if filename in self.keep:
+                if self.verbose >= 1:
+                    click.secho('Keeping %s' % filename, fg='yellow')
+                continue
             file_path = os.path.join(target_dir, filename)
             if self.verbose >= 2:
                 click.secho('Attempting to delete %s' % file_path, fg='yellow')
-            # Try delete file or directory
+            # Try move aside, otherwise delete file or directory
             try:
+                try:
+                    os.rename(file_path, os.path.join(trash_dir, filename))
+                    continue
+                except OSError:
+                    pass
                 if os.path.isfile(file_path) or os.path.islink(file_path):
                     os.unlink(file_path)
                 elif os.path.isdir(file_path):
@@ -137,18 +280,56 @@ class StructureHandler:
                 if self.verbose >= 1:
                     click.secho('Failed to %s. Reason: %s' % (file_path, e), fg='yellow')
                 self.__ctx__.fail(colored('Failed to clear contents of target directory', 'red', attrs=['bold']))
+        self.delete_in_background(trash_dir)
         click.secho('Directory Emptied', fg='green')
 
+    def delete_in_background(self, target_dir):
+        """
+        Deletes a directory tree in a detached process that may outlive boom
+
+        Falls back to deleting it in place if the process cannot be started.
+
+        :param target_dir: Path of directory to delete
+        """
+        if self.verbose >= 2:
+            click.secho('Deleting %s in the background' % target_dir, fg='yellow')
+        try:
+            subprocess.Popen([sys.executable, '-c', 'import shutil, sys; shutil.rmtree(sys.argv[1], True)', target_dir],
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                             start_new_session=True)
+        except OSError:
+            shutil.rmtree(target_dir, ignore_errors=True)
+
     def create_files_for_dir(self, template_dir, out_dir, root=False, type='app'):
         """
         Recursively create files and folders in target using template
 
+        Directories are created first, the files are then rendered and written by a thread pool.
+
         :param root:
         :param template_dir:
         :param out_dir:
         :return:
         """
-        for filename in os.listdir(template_dir):
+        files = []
+        self.plan_files_for_dir(template_dir, out_dir, files, root=root, type=type)
+        self.create_files(files)
+
+    def plan_files_for_dir(self, template_dir, out_dir, files, root=False, type='app', dirs=None, merge=False):
+        """
+        Recursively creates folders in target and collects the files to create
+
+        Folders are only collected when in dry run mode. Existing target folders are skipped unless merging.
+
+        :param template_dir: Template directory
+        :param out_dir: Target directory
+        :param files: List the (source, target) file paths are appended to, in template order
+        :param root: If template directory is the template root
+        :param type: Template type
+        :param dirs: List the created target folders are appended to
+        :param merge: Collect the files of existing target folders too
+        """
+        for filename, is_dir in TemplateHandler.list_dir(template_dir):
             if filename == 'template.boom.json':
                 continue
             template_file_path = os.path.join(template_dir, filename)
@@ -156,36 +337,265 @@ class StructureHandler:
             if type == 'function':
                 pass
             else:
-                allow_render = self.type_app_create(template_file_path)
+                allow_render = self.type_app_create(template_file_path, is_dir)
             if not allow_render:
                 continue
             if filename.endswith('.jinja2'):
                 filename = filename[:-7]
-            if os.path.isdir(template_file_path) and filename == 'project' and root:
+            if is_dir and filename == 'project' and root:
                 filename = self.root_vars.get('project_name_path')
             target_file_path = os.path.join(out_dir, filename)
             # Recursive if is directory
-            if os.path.isdir(template_file_path):
-                if os.path.exists(target_file_path) or filename.startswith('__'):
+            if is_dir:
+                if filename.startswith('__'):
                     continue
-                os.makedirs(target_file_path)
-                self.create_files_for_dir(template_file_path, target_file_path)
+                if not self.dry_run and os.path.exists(target_file_path):
+                    if not merge:
+                        continue
+                elif not self.dry_run:
+                    os.makedirs(target_file_path)
+                if dirs is not None:
+                    dirs.append(target_file_path)
+                self.plan_files_for_dir(template_file_path, target_file_path, files, dirs=dirs, merge=merge)
                 continue
-            self.create_file(template_file_path, target_file_path)
+            files.append((template_file_path, target_file_path))
+
+    @traced('create_files')
+    def create_files(self, files):
+        """
+        Renders and writes files using a bounded thread pool
+
+        At most twice the number of workers are queued at once and results are collected in order, so the first
+        failure (in file order) is raised through the click context as if the files were created serially.
+
+        :param files: List of (source, target) file paths
+        :return: List of bytes written per file
+        """
+        sizes = self.map_files(self.create_file, files)
+        annotate(files=len(files), bytes=sum(size or 0 for size in sizes))
+        return sizes
+
+    def map_files(self, function, files, *args):
+        """
+        Calls function for each (source, target) pair using the bounded thread pool of create_files
+
+        :param function: Function taking the source and target file paths, then args
+        :param files: List of (source, target) file paths
+        :return: List of results, in file order
+        """
+        if self.workers <= 1 or len(files) <= 1:
+            return [function(source_file_path, target_file_path, *args)
+                    for source_file_path, target_file_path in files]
+        results = []
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            try:
+                for source_file_path, target_file_path in files:
+                    if len(pending) >= self.workers * 2:
+                        results.append(pending.popleft().result())
+                    pending.append(executor.submit(function, source_file_path, target_file_path, *args))
+                while pending:
+                    results.append(pending.popleft().result())
+            finally:
+                for future in pending:
+                    future.cancel()
+        return results
 
+    @traced('render_file')
     def create_file(self, source_file_path, target_file_path):
-        if not is_pathname_valid(source_file_path) or not os.path.exists(source_file_path) or \
-                not os.path.isfile(source_file_path) or not is_pathname_valid(target_file_path):
+        """
+        Renders a template file to the target path
+
+        Files that are not templates are copied as is. Templates of at least STREAM_THRESHOLD bytes are rendered in
+        chunks straight to the target, so memory use does not grow with the size of the file.
+
+        :param source_file_path: Template file
+        :param target_file_path: File to write, only rendered in memory in dry run mode
+        :return: Number of bytes of the rendered file
+        """
+        if not self.path_validator.is_pathname_valid(source_file_path) or \
+                not self.path_validator.is_pathname_valid(target_file_path):
             self.__ctx__.fail(
                 colored('File path is invalid. Could be a file system permissions error.', 'red', attrs=['bold']))
             return
-        with open(source_file_path, 'r') as source_file:
-            res = TemplateHandler.render_template(source_file_path, source_file.read(), self.root_vars)
-            with open(target_file_path, 'w+') as out_file:
-                out_file.write(res)
+        try:
+            if not TemplateHandler.is_template_file(source_file_path):
+                size = self.copy_file(source_file_path, target_file_path)
+            elif TemplateHandler.get_size(source_file_path) >= STREAM_THRESHOLD:
+                size, _ = self.stream_file(source_file_path, None if self.dry_run else target_file_path)
+            else:
+                res = TemplateHandler.render_file(source_file_path, self.root_vars)
+                if not self.dry_run:
+                    with open(target_file_path, 'w+') as out_file:
+                        out_file.write(res)
+                        out_file.close()
+                    self.record_file(source_file_path, target_file_path, hash_text(res))
+                size = len(res.encode())
+        except OSError as e:
+            if self.verbose >= 2:
+                click.secho(e.__str__(), fg='yellow')
+            self.__ctx__.fail(
+                colored('File path is invalid. Could be a file system permissions error.', 'red', attrs=['bold']))
+            return
+        annotate(bytes=size)
+        return size
+
+    def copy_file(self, source_file_path, target_file_path):
+        """
+        Copies a file that is not a template to the target path
+
+        Files on disk are copied by the kernel (sendfile on Linux) so the data never passes through Python.
+
+        :param source_file_path: File to copy
+        :param target_file_path: File to write, nothing is written in dry run mode
+        :return: Number of bytes of the file
+        """
+        if not self.dry_run:
+            TemplateHandler.copy_file(source_file_path, target_file_path)
+            self.record_file(source_file_path, target_file_path, self.get_source_hash(source_file_path))
+        return TemplateHandler.get_size(source_file_path)
+
+    def stream_file(self, source_file_path, target_file_path):
+        """
+        Renders a template in chunks, writing each chunk to the target path as it is rendered
+
+        :param source_file_path: Template file
+        :param target_file_path: File to write, or None to only measure and hash the output
+        :return: Number of bytes and hash of the rendered file
+        """
+        digest = hashlib.sha256()
+        size = 0
+        out_file = open(target_file_path, 'w+') if target_file_path is not None else None
+        try:
+            for chunk in TemplateHandler.generate_file(source_file_path, self.root_vars, STREAM_CHUNK_SIZE):
+                data = chunk.encode()
+                digest.update(data)
+                size += len(data)
+                if out_file is not None:
+                    out_file.write(chunk)
+        finally:
+            if out_file is not None:
                 out_file.close()
+        if target_file_path is not None:
+            self.record_file(source_file_path, target_file_path, digest.hexdigest())
+        return size, digest.hexdigest()
+
+    def get_output_hash(self, source_file_path):
+        """
+        Gets the hash of what create_file would write for a file, without writing it
+
+        :param source_file_path: Template file
+        :return: Hex digest
+        """
+        if not TemplateHandler.is_template_file(source_file_path):
+            return self.get_source_hash(source_file_path)
+        if TemplateHandler.get_size(source_file_path) >= STREAM_THRESHOLD:
+            _, output_hash = self.stream_file(source_file_path, None)
+            return output_hash
+        return hash_text(TemplateHandler.render_file(source_file_path, self.root_vars))
+
+    def sync_file(self, source_file_path, target_file_path, files, force=False):
+        """
+        Renders a template file to the target path if its template or variables changed since it was last written
+
+        Files changed since they were last written (or not written by boom) are not overwritten unless forced, and
+        never if their template and the variables it uses did not change.
+
+        :param source_file_path: Template file
+        :param target_file_path: File to write
+        :param files: Dict of path relative to the project root to the hashes recorded when it was last written
+        :param force: Overwrite changed files
+        :return: 'unchanged', 'created', 'updated' or 'edited' if the file was changed and not overwritten
+        """
+        if not self.path_validator.is_pathname_valid(source_file_path) or \
+                not self.path_validator.is_pathname_valid(target_file_path):
+            self.__ctx__.fail(
+                colored('File path is invalid. Could be a file system permissions error.', 'red', attrs=['bold']))
+            return
+        entry = files.get(self.get_relative_path(target_file_path)) or {}
+        if TemplateHandler.is_template_file(source_file_path):
+            current_hash = hash_text_file(target_file_path)
+        else:
+            current_hash = hash_file(target_file_path) if os.path.isfile(target_file_path) else None
+        # Nothing to render if neither the template nor the variables it uses changed
+        template_changed = entry.get('source') != self.get_source_hash(source_file_path) or \
+            entry.get('inputs') != self.get_inputs_hash(source_file_path)
+        exists = os.path.exists(target_file_path)
+        if not template_changed and exists:
+            if current_hash == entry.get('output'):
+                self.record_file(source_file_path, target_file_path, current_hash)
+            # Edited files are kept as they are, even when forced, as there is nothing new to write to them
+            return 'unchanged'
+        try:
+            if current_hash == self.get_output_hash(source_file_path):
+                self.record_file(source_file_path, target_file_path, current_hash)
+                return 'unchanged'
+        except OSError as e:
+            if self.verbose >= 2:
+                click.secho(e.__str__(), fg='yellow')
+            self.__ctx__.fail(
+                colored('File path is invalid. Could be a file system permissions error.', 'red', attrs=['bold']))
+            return
+        if exists and current_hash != entry.get('output') and not force:
+            return 'edited'
+        self.create_file(source_file_path, target_file_path)
+        return 'updated' if exists else 'created'
+
+    def record_file(self, source_file_path, target_file_path, output_hash):
+        """
+        Records the hashes of the template, variables and content of a written file
+
+        :param source_file_path: Template file
+        :param target_file_path: Written file
+        :param output_hash: Hash of the written content
+        """
+        self.file_hashes[self.get_relative_path(target_file_path)] = {
+            'source': self.get_source_hash(source_file_path),
+            'inputs': self.get_inputs_hash(source_file_path),
+            'output': output_hash
+        }
+
+    def get_source_hash(self, source_file_path):
+        """
+        Gets the (cached) content hash of a template file
+
+        :param source_file_path: Template file
+        :return: Hex digest
+        """
+        if source_file_path not in self.source_hashes:
+            with TemplateHandler.open_file(source_file_path) as f:
+                self.source_hashes[source_file_path] = hash_fileobj(f)
+        return self.source_hashes[source_file_path]
+
+    def get_inputs_hash(self, source_file_path):
+        """
+        Gets the hash of the variables a template file uses, so changing other variables (e.g. the required packages
+        of the template) does not change the hash
+
+        :param source_file_path: Template file
+        :return: Hex digest
+        """
+        if source_file_path not in self.template_keys:
+            if TemplateHandler.is_template_file(source_file_path):
+                from jinja2 import meta
+                ast = TemplateHandler.get_environment().parse(TemplateHandler.read_text(source_file_path))
+                self.template_keys[source_file_path] = meta.find_undeclared_variables(ast)
+            else:
+                self.template_keys[source_file_path] = set()
+        return hash_vars(self.root_vars, self.template_keys[source_file_path])
+
+    def get_relative_path(self, target_file_path):
+        """
+        Gets the path of a file relative to the project root, as recorded in the project settings
+
+        :param target_file_path: Path of file in the project (or the directory it is staged in)
+        :return: Relative path using forward slashes
+        """
+        return os.path.relpath(target_file_path, self.output_root).replace(os.sep, '/')
 
-    def type_app_create(self, template_file_path):
-        if template_file_path.endswith('app') and os.path.isdir(template_file_path):
+    def type_app_create(self, template_file_path, is_dir=None):
+        if is_dir is None:
+            is_dir = TemplateHandler.is_dir(template_file_path)
+        if template_file_path.endswith('app') and is_dir:
             return False
         return True
@@ -1,15 +1,23 @@
+import hashlib
 import json
 import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
 
 import click
-from jinja2 import Template
-from schema import SchemaError
 from termcolor import colored
 
-from boom.schema.template_config import template_config_schema
+from boom.utils.archive_helper import TemplateArchive, is_archive
+from boom.utils.cache_helper import get_cache_dir
 from boom.utils.path_helper import valid_directory
+from boom.utils.trace_helper import annotate, traced
 
 DO_NOT_TEMPLATE_FILES = ['template.boom.json']
+# Files whose changes invalidate a template's index entry, on top of its directories
+INDEXED_FILES = ['template.boom.json', 'requirements.txt']
+INDEX_VERSION = 1
 
 
 class TemplateHandler:
@@ -24,6 +32,11 @@ class TemplateHandler:
     # Static
     templates_path: str
     templates = []
+    trees = {}
+    archives = {}
+    archives_lock = threading.Lock()
+    environment = None
+    environment_path = None
 
     def __init__(self, ctx, verbose=0) -> None:
         """
@@ -58,57 +71,374 @@ class TemplateHandler:
 
     def load_template_conf(self, root_dir):
         abs_path = os.path.join(TemplateHandler.templates_path, root_dir)
-        if not valid_directory(abs_path):
+        if not (valid_directory(abs_path) or self.is_archive_path(abs_path)):
             if self.verbose >= 1:
                 click.secho('Invalid template path: %s' % abs_path, fg='yellow')
             return None
-        with open(os.path.join(abs_path, 'template.boom.json'), "r") as f:
-            template_conf = json.loads(f.read())
-            f.close()
-            try:
-                template_conf = self.validate_template_config(template_conf)
-            except SchemaError as e:
-                if self.verbose >= 1:
-                    click.secho('Invalid Template config: %s' % e, fg='yellow')
-                return None
-            # These variables are not saved but are just easier than keep checking
-            template_conf.update(root_dir=root_dir)
-            template_conf.update(abs_dir=abs_path)
-            # Set required packages
-            req = self.load_requirements(abs_path)
-            template_conf.update(required_packages=req)
-            return template_conf
+        template_conf = json.loads(self.read_text(os.path.join(abs_path, 'template.boom.json')))
+        from schema import SchemaError
+        try:
+            template_conf = self.validate_template_config(template_conf)
+        except SchemaError as e:
+            if self.verbose >= 1:
+                click.secho('Invalid Template config: %s' % e, fg='yellow')
+            return None
+        # These variables are not saved but are just easier than keep checking
+        template_conf.update(root_dir=root_dir)
+        template_conf.update(abs_dir=abs_path)
+        # Set required packages
+        req = self.load_requirements(abs_path)
+        template_conf.update(required_packages=req)
+        return template_conf
 
     @staticmethod
     def load_requirements(template_path):
         req_path = os.path.join(template_path, 'requirements.txt')
         req = []
-        if os.path.exists(req_path):
-            with open(req_path, "r") as f:
-                # TODO: Strip versions?
-                req = f.read().split('\n')
+        if TemplateHandler.exists(req_path):
+            # TODO: Strip versions?
+            req = TemplateHandler.read_text(req_path).split('\n')
         return req
 
+    @traced('load_templates')
     def load_templates(self):
         """
         Loads available templates
 
-        Skips if templates are already loaded
+        Validated configs and file trees are read from the template index, only templates that changed since they were
+        indexed are validated and walked again. Templates are directories or template packs, zip or tar archives holding
+        a template at their root or one template per top level directory.
         """
+        index = self.read_index()
+        entries = {}
         TemplateHandler.templates = []
-        for template in os.listdir(TemplateHandler.templates_path):
-            template_config = self.load_template_conf(template)
-            if template_config is None:
+        TemplateHandler.trees = {}
+        TemplateHandler.close_archives()
+        template_dirs = []
+        with os.scandir(TemplateHandler.templates_path) as it:
+            for entry in sorted(it, key=lambda e: e.name):
+                if entry.is_dir():
+                    template_dirs.append(entry.name)
+                elif is_archive(entry.path):
+                    TemplateHandler.archives[entry.path] = None
+                    template_dirs.extend(self.list_archive_templates(entry.name, index))
+        for template in template_dirs:
+            entry = index.get(template)
+            if entry is None or not self.is_index_entry_fresh(template, entry):
+                entry = self.index_template(template)
+            entries[template] = entry
+            if entry.get('config') is None:
+                if self.verbose >= 1:
+                    click.secho('Skipping invalid template: %s' % template, fg='yellow')
                 continue
+            template_config = dict(entry.get('config'))
+            TemplateHandler.trees[template_config.get('abs_dir')] = entry.get('tree')
             TemplateHandler.templates.append(template_config)
+        if entries != index:
+            self.write_index(entries)
+        annotate(templates=len(TemplateHandler.templates))
+
+    @traced('index_template')
+    def index_template(self, root_dir):
+        """
+        Validates a template and builds its index entry
+
+        :param root_dir: Template directory name
+        :return: Index entry with the mtime signature, validated config (None if invalid) and file tree
+        """
+        if self.verbose >= 2:
+            click.secho('Indexing template: %s' % root_dir, fg='yellow')
+        abs_path = os.path.join(TemplateHandler.templates_path, root_dir)
+        archive, name = TemplateHandler.split_archive_path(abs_path)
+        if archive is not None:
+            # Archives are only ever replaced as a whole
+            tree = archive.build_tree(name)
+            signature = {os.path.relpath(archive.path, abs_path): os.stat(archive.path).st_mtime_ns}
+            return {'signature': signature, 'config': self.load_template_conf(root_dir), 'tree': tree}
+        tree = self.build_tree(abs_path)
+        signature = {rel_dir: os.stat(os.path.join(abs_path, rel_dir)).st_mtime_ns for rel_dir in tree}
+        for filename in INDEXED_FILES:
+            path = os.path.join(abs_path, filename)
+            signature[filename] = os.stat(path).st_mtime_ns if os.path.exists(path) else None
+        return {'signature': signature, 'config': self.load_template_conf(root_dir), 'tree': tree}
+
+    def list_archive_templates(self, archive_name, index):
+        """
+        Lists the templates of a template pack, from the index if the pack did not change since it was indexed
+
+        :param archive_name: Filename of the archive in the templates path
+        :param index: Template index
+        :return: List of template directory names, e.g. pack.zip/basic
+        """
+        indexed = [template for template in index if template == archive_name or
+                   template.startswith(archive_name + '/')]
+        if len(indexed) > 0 and all(self.is_index_entry_fresh(template, index.get(template)) for template in indexed):
+            return indexed
+        archive = TemplateHandler.get_archive(os.path.join(TemplateHandler.templates_path, archive_name))
+        if archive.exists('template.boom.json'):
+            return [archive_name]
+        return [archive_name + '/' + name for name, is_dir in archive.list_dir('')
+                if is_dir and archive.exists(name + '/template.boom.json')]
+
+    @staticmethod
+    def build_tree(abs_path):
+        """
+        Walks a template directory
+
+        :param abs_path: Template directory
+        :return: Dict of directory (relative to the template) to sorted list of [name, is_dir] entries
+        """
+        tree = {}
+        dirs = ['']
+        while dirs:
+            rel_dir = dirs.pop()
+            with os.scandir(os.path.join(abs_path, rel_dir)) as it:
+                entries = sorted([entry.name, entry.is_dir()] for entry in it)
+            tree[rel_dir] = entries
+            dirs.extend(os.path.join(rel_dir, name) for name, is_dir in entries if is_dir)
+        return tree
+
+    @staticmethod
+    def is_index_entry_fresh(root_dir, entry):
+        """
+        Checks an index entry against the template on disk
+
+        Directory mtimes change when entries are added, removed or renamed so only the directories and config files
+        are checked, not every file.
+
+        :param root_dir: Template directory name
+        :param entry: Index entry
+        :return bool: If the entry is still valid
+        """
+        abs_path = os.path.join(TemplateHandler.templates_path, root_dir)
+        for rel_path, mtime in entry.get('signature', {}).items():
+            try:
+                # Normalised as the signature of a template in an archive is the archive, e.g. pack.zip/basic/..
+                if os.stat(os.path.normpath(os.path.join(abs_path, rel_path))).st_mtime_ns != mtime:
+                    return False
+            except FileNotFoundError:
+                if mtime is not None:
+                    return False
+        return bool(entry.get('signature'))
+
+    @staticmethod
+    def get_index_path():
+        """
+        Gets the path of the index for the current templates path
+
+        :return: Path to index file
+        """
+        key = hashlib.sha1(os.path.abspath(TemplateHandler.templates_path).encode()).hexdigest()[:16]
+        return os.path.join(get_cache_dir('index'), 'templates-%s.json' % key)
+
+    def read_index(self):
+        """
+        Reads the template index
+
+        :return: Dict of template directory name to index entry, empty if there is no usable index
+        """
+        try:
+            with open(self.get_index_path(), 'r') as f:
+                index = json.loads(f.read())
+        except (OSError, ValueError):
+            return {}
+        if index.get('version') != INDEX_VERSION or index.get('templates_path') != TemplateHandler.templates_path:
+            return {}
+        return index.get('templates', {})
+
+    def write_index(self, entries):
+        """
+        Writes the template index
+
+        Written to a temporary file and renamed into place so concurrent runs never read a partial index.
+
+        :param entries: Dict of template directory name to index entry
+        """
+        index_path = self.get_index_path()
+        index = {'version': INDEX_VERSION, 'templates_path': TemplateHandler.templates_path, 'templates': entries}
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(index_path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                f.write(json.dumps(index))
+            os.replace(tmp_path, index_path)
+        except OSError as e:
+            if self.verbose >= 1:
+                click.secho('Failed to write template index: %s' % e, fg='yellow')
+
+    @staticmethod
+    def list_dir(path):
+        """
+        Lists a template directory, using the indexed file tree when available
+
+        :param path: Absolute path of directory inside a template
+        :return: List of (name, is_dir)
+        """
+        for abs_dir, tree in TemplateHandler.trees.items():
+            rel_path = os.path.relpath(path, abs_dir)
+            if rel_path == '.':
+                rel_path = ''
+            if rel_path in tree:
+                return [(name, is_dir) for name, is_dir in tree[rel_path]]
+        archive, name = TemplateHandler.split_archive_path(path)
+        if archive is not None:
+            return archive.list_dir(name)
+        with os.scandir(path) as it:
+            return sorted((entry.name, entry.is_dir()) for entry in it)
+
+    @staticmethod
+    def is_dir(path):
+        """
+        Checks if a path inside a template is a directory, using the indexed file tree when available
+
+        :param path: Absolute path inside a template
+        :return bool: If path is a directory
+        """
+        parent, name = os.path.split(path)
+        for abs_dir, tree in TemplateHandler.trees.items():
+            rel_path = os.path.relpath(parent, abs_dir)
+            if rel_path == '.':
+                rel_path = ''
+            if rel_path in tree:
+                return [name, True] in tree[rel_path]
+        archive, name = TemplateHandler.split_archive_path(path)
+        if archive is not None:
+            return archive.is_dir(name)
+        return os.path.isdir(path)
+
+    @staticmethod
+    def is_archive_path(path):
+        """
+        Checks if a path is inside a template pack
+
+        :param path: Absolute path
+        :return bool: If path is a template pack or inside one
+        """
+        return any(path == archive_path or path.startswith(archive_path + os.sep)
+                   for archive_path in TemplateHandler.archives)
+
+    @staticmethod
+    def get_archive(archive_path):
+        """
+        Gets a template pack, opening it on first use
+
+        :param archive_path: Path of archive
+        :return: TemplateArchive or None if the path is not a known template pack
+        """
+        if archive_path not in TemplateHandler.archives:
+            return None
+        archive = TemplateHandler.archives.get(archive_path)
+        if archive is None:
+            with TemplateHandler.archives_lock:
+                archive = TemplateHandler.archives.get(archive_path)
+                if archive is None:
+                    archive = TemplateArchive(archive_path)
+                    TemplateHandler.archives[archive_path] = archive
+        return archive
+
+    @staticmethod
+    def split_archive_path(path):
+        """
+        Splits a path inside a template pack
+
+        :param path: Absolute path
+        :return: TemplateArchive and member name, or None and None if the path is not in a template pack
+        """
+        for archive_path in TemplateHandler.archives:
+            if path == archive_path:
+                return TemplateHandler.get_archive(archive_path), ''
+            if path.startswith(archive_path + os.sep):
+                return TemplateHandler.get_archive(archive_path), \
+                       os.path.relpath(path, archive_path).replace(os.sep, '/')
+        return None, None
+
+    @staticmethod
+    def close_archives():
+        for archive in TemplateHandler.archives.values():
+            if archive is not None:
+                archive.close()
+        TemplateHandler.archives = {}
+
+    @staticmethod
+    def exists(path):
+        """
+        Checks if a path inside a template exists
+
+        :param path: Absolute path, may be inside a template pack
+        :return bool: If path exists
+        """
+        archive, name = TemplateHandler.split_archive_path(path)
+        if archive is not None:
+            return archive.exists(name)
+        return os.path.exists(path)
 
     @staticmethod
+    def get_size(path):
+        """
+        :param path: Absolute path of file, may be inside a template pack
+        :return: Size of file in bytes
+        """
+        archive, name = TemplateHandler.split_archive_path(path)
+        if archive is not None:
+            return archive.get_size(name)
+        return os.path.getsize(path)
+
+    @staticmethod
+    @contextmanager
+    def open_file(path):
+        """
+        Opens a template file for reading in binary mode
+
+        :param path: Absolute path of file, may be inside a template pack
+        :return: File object
+        """
+        archive, name = TemplateHandler.split_archive_path(path)
+        if archive is not None:
+            with archive.open(name) as f:
+                yield f
+        else:
+            with open(path, 'rb') as f:
+                yield f
+
+    @staticmethod
+    def read_text(path):
+        """
+        Reads a template file
+
+        :param path: Absolute path of file, may be inside a template pack
+        :return: Content of file
+        """
+        archive, name = TemplateHandler.split_archive_path(path)
+        if archive is not None:
+            return archive.read(name).decode()
+        with open(path, 'r') as f:
+            return f.read()
+
+    @staticmethod
+    def copy_file(path, target_path):
+        """
+        Copies a template file as is
+
+        Files on disk are copied with shutil.copyfile so the kernel copies the data (sendfile on Linux), files in
+        template packs are decompressed straight to the target.
+
+        :param path: Absolute path of file, may be inside a template pack
+        :param target_path: File to write
+        """
+        archive, name = TemplateHandler.split_archive_path(path)
+        if archive is not None:
+            archive.copy(name, target_path)
+        else:
+            shutil.copyfile(path, target_path)
+
+    @staticmethod
+    @traced('validate_template_config')
     def validate_template_config(template_config):
         """
         Validates the template config
         :param template_config: Config to check
         :return bool: valid template config
         """
+        from boom.schema.template_config import template_config_schema
         return template_config_schema.validate(template_config)
 
     @property
@@ -120,20 +450,104 @@ class TemplateHandler:
         return list(map(lambda t: f"{t.get('name').capitalize()[:10]} - ({t.get('description')[:20]})", self.templates))
 
     @staticmethod
-    def render_template(path, content, template_vars):
+    def get_environment():
+        """
+        Gets the Jinja environment shared by all templates
+
+        Templates are loaded relative to the templates path, from template packs or directories, and their compiled
+        bytecode is cached on disk, so templates are only compiled again when their source changes.
+
+        :return: Jinja environment
+        """
+        env = TemplateHandler.environment
+        if env is None or TemplateHandler.environment_path != TemplateHandler.templates_path:
+            from jinja2 import ChoiceLoader, Environment, FileSystemBytecodeCache, FileSystemLoader
+            from boom.utils.archive_loader import ArchiveLoader
+            loader = ChoiceLoader([ArchiveLoader(TemplateHandler.templates_path, TemplateHandler.get_archive),
+                                   FileSystemLoader(TemplateHandler.templates_path)])
+            env = Environment(loader=loader, bytecode_cache=FileSystemBytecodeCache(get_cache_dir('jinja')))
+            TemplateHandler.environment = env
+            TemplateHandler.environment_path = TemplateHandler.templates_path
+        return env
+
+    @staticmethod
+    def get_template_name(path):
+        """
+        Gets the loader name of a template file
+
+        :param path: Path to file
+        :return: Name relative to the templates path or None if the file is not in it
+        """
+        rel_path = os.path.relpath(os.path.abspath(path), TemplateHandler.templates_path)
+        if rel_path.startswith(os.pardir):
+            return None
+        return rel_path.replace(os.sep, '/')
+
+    @staticmethod
+    def is_template_file(path):
+        """
+        Checks if a file should be processed as a template
+
+        :param path: Path to file
+        :return bool: If file is a template
+        """
+        _, filename = os.path.split(path)
+        return filename not in DO_NOT_TEMPLATE_FILES and filename.endswith('.jinja2')
+
+    @staticmethod
+    def render_file(path, template_vars):
         """
         Processes template file and returns processed content
 
+        :param path: Path to file
+        :param template_vars: Variables to use
+        :return: Processed content
+        """
+        name = TemplateHandler.get_template_name(path)
+        if not TemplateHandler.is_template_file(path) or name is None:
+            return TemplateHandler.render_template(path, TemplateHandler.read_text(path), template_vars)
+        return TemplateHandler.get_environment().get_template(name).render(**template_vars)
+
+    @staticmethod
+    def generate_file(path, template_vars, chunk_size=1 << 16):
+        """
+        Processes template file and yields the processed content in chunks
+
+        :param path: Path to template file
+        :param template_vars: Variables to use
+        :param chunk_size: Minimum number of characters per chunk, except for the last one
+        :return: Iterator of processed content
+        """
+        name = TemplateHandler.get_template_name(path)
+        if name is None:
+            template = TemplateHandler.get_environment().from_string(TemplateHandler.read_text(path))
+        else:
+            template = TemplateHandler.get_environment().get_template(name)
+        buffer = []
+        buffered = 0
+        for part in template.generate(**template_vars):
+            buffer.append(part)
+            buffered += len(part)
+            if buffered >= chunk_size:
+                yield ''.join(buffer)
+                buffer = []
+                buffered = 0
+        if buffer:
+            yield ''.join(buffer)
+
+    @staticmethod
+    def render_template(path, content, template_vars):
+        """
+        Processes template content and returns processed content
+
         :param path: Path to file
         :param content: Content to process
         :param template_vars: Variables to use
         :return: Processed content
         """
-        _, filename = os.path.split(path)
-        if filename in DO_NOT_TEMPLATE_FILES or not filename.endswith('.jinja2'):
+        if not TemplateHandler.is_template_file(path):
             return content
-        tm = Template(content)
-        return tm.render(**template_vars)
+        return TemplateHandler.get_environment().from_string(content).render(**template_vars)
 
     @staticmethod
     def template_filename(filename, template_vars):
@@ -144,5 +558,4 @@ class TemplateHandler:
         :param template_vars: Variables to use
         :return: Processed filename
         """
-        tm = Template(filename)
-        return tm.render(**template_vars)
+        return TemplateHandler.get_environment().from_string(filename).render(**template_vars)
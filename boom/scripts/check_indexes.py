@@ -0,0 +1,92 @@
+"""
+Compares the indexes declared by the mongoengine models of a project with the indexes in MongoDB, as JSON
+
+Run with the project's python from the project root, as boom itself may not be installed there::
+
+    python check_indexes.py my_project [--host mongodb://localhost:27017/app] [--create]
+
+The host defaults to MONGODB_URI of the project config. With --create the missing indexes are created first.
+"""
+import argparse
+import contextlib
+import importlib
+import inspect
+import json
+import os
+import sys
+
+# Seconds to wait for MongoDB before giving up
+SERVER_SELECTION_TIMEOUT_MS = 3000
+
+
+def get_config_uri():
+    config = importlib.import_module('config.config')
+    config_name = 'ProductionConfig' if os.environ.get('FLASK_ENV') == 'production' else 'DevelopmentConfig'
+    return getattr(config, config_name).MONGODB_URI
+
+
+def import_models(package):
+    """
+    Imports the models.py modules of the package
+
+    :param package: Name of project package
+    :return: List of imported modules
+    """
+    modules = []
+    for dir_path, dir_names, file_names in os.walk(package):
+        dir_names[:] = [name for name in dir_names if name != '__pycache__']
+        if 'models.py' in file_names:
+            module_name = '.'.join(os.path.normpath(dir_path).split(os.sep) + ['models'])
+            modules.append(importlib.import_module(module_name))
+    return modules
+
+
+def get_documents(modules):
+    from mongoengine import Document
+
+    documents = []
+    for module in modules:
+        for _, member in inspect.getmembers(module, inspect.isclass):
+            if issubclass(member, Document) and member.__module__ == module.__name__ and \
+                    not member._meta.get('abstract'):
+                documents.append(member)
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('package')
+    parser.add_argument('--host')
+    parser.add_argument('--create', action='store_true')
+    args = parser.parse_args()
+    sys.path.insert(0, os.getcwd())
+
+    import mongoengine
+    from pymongo.errors import PyMongoError
+
+    # Anything the project prints while importing must not end up in the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        host = args.host or get_config_uri()
+        documents = get_documents(import_models(args.package))
+    mongoengine.connect(host=host, serverSelectionTimeoutMS=SERVER_SELECTION_TIMEOUT_MS)
+    results = []
+    try:
+        for document in documents:
+            if args.create:
+                document.ensure_indexes()
+            # Otherwise mongoengine creates the indexes when first getting the collection to compare them
+            document._meta['auto_create_index'] = False
+            indexes = document.compare_indexes()
+            # MongoDB creates the _id index with the collection
+            missing = [index for index in indexes.get('missing') if list(index) != [('_id', 1)]]
+            results.append({'model': '%s.%s' % (document.__module__, document.__name__),
+                            'collection': document._get_collection_name(),
+                            'missing': missing, 'extra': indexes.get('extra')})
+    except PyMongoError as e:
+        sys.stderr.write('Could not check indexes on %s: %s\n' % (host, e))
+        sys.exit(2)
+    sys.stdout.write(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
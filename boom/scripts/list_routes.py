@@ -0,0 +1,34 @@
+"""
+Prints the routes of a flask app as JSON
+
+Run with the project's python from the project root, as boom itself may not be installed there::
+
+    python list_routes.py app.py app
+
+Each route is printed with its endpoint, methods and arguments, static files are left out.
+"""
+import contextlib
+import importlib
+import json
+import os
+import sys
+
+
+def main():
+    start_file, app_name = sys.argv[1], sys.argv[2]
+    sys.path.insert(0, os.getcwd())
+    # Anything the app prints while importing must not end up in the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        module = importlib.import_module(os.path.splitext(start_file)[0].replace(os.sep, '.'))
+    app = getattr(module, app_name)
+    routes = []
+    for rule in app.url_map.iter_rules():
+        if rule.endpoint == 'static':
+            continue
+        routes.append({'rule': rule.rule, 'endpoint': rule.endpoint, 'methods': sorted(rule.methods or []),
+                       'arguments': sorted(rule.arguments)})
+    sys.stdout.write(json.dumps(routes))
+
+
+if __name__ == '__main__':
+    main()
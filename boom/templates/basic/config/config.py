@@ -1,10 +1,28 @@
+import os
+
+
 class Config(object):
     DEBUG = False
 
+    # Response cache, see project/cache.py. CACHE_TYPE is simple (in process LRU), redis, null or a dotted class path
+    CACHE_TYPE = 'simple'
+    CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_MAX_ENTRIES = 1024
+    CACHE_MAX_SIZE = 64 * 1024 * 1024
+    CACHE_KEY_PREFIX = 'cache:'
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
 
+    # Short lived so changes show up quickly
+    CACHE_DEFAULT_TIMEOUT = 5
+
 
 class ProductionConfig(Config):
     DEBUG = False
+
+    # Shared by all workers when a redis url is given, which needs the redis package: pip install redis
+    CACHE_TYPE = 'redis' if os.environ.get('CACHE_REDIS_URL') else 'simple'
+    CACHE_DEFAULT_TIMEOUT = 300
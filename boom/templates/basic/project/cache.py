@@ -0,0 +1,181 @@
+import functools
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from importlib import import_module
+
+from flask import current_app, make_response, request
+
+
+class LRUCache(object):
+    """
+    In process cache evicting the least recently used entries
+
+    Entries expire after their timeout, the least recently used ones are evicted once there are more than max_entries
+    or their values add up to more than max_size bytes. Each process (e.g. gunicorn worker) has its own cache.
+    """
+
+    def __init__(self, default_timeout=300, max_entries=1024, max_size=64 * 1024 * 1024, **kwargs):
+        self.default_timeout = default_timeout
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.size = 0
+        # Key to (expires, size, value), least recently used first
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= time.monotonic():
+                self.__remove__(key)
+                return None
+            self.entries.move_to_end(key)
+            return entry[2]
+
+    def set(self, key, value, timeout=None, size=0):
+        timeout = self.default_timeout if timeout is None else timeout
+        if size > self.max_size:
+            return
+        expires = time.monotonic() + timeout if timeout else None
+        with self.lock:
+            if key in self.entries:
+                self.__remove__(key)
+            self.entries[key] = (expires, size, value)
+            self.size += size
+            while len(self.entries) > self.max_entries or self.size > self.max_size:
+                self.__remove__(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self.__remove__(key)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def __remove__(self, key):
+        self.size -= self.entries.pop(key)[1]
+
+
+class RedisCache(object):
+    """
+    Cache shared by all processes and servers in redis
+
+    Needs the redis package: pip install redis
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', default_timeout=300, key_prefix='cache:', **kwargs):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('CACHE_TYPE is redis (e.g. CACHE_REDIS_URL is set in production) but the redis package '
+                               'is not installed, install it with: pip install redis')
+
+        self.client = redis.Redis.from_url(url)
+        self.default_timeout = default_timeout
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        value = self.client.get(self.key_prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, timeout=None, size=0):
+        timeout = self.default_timeout if timeout is None else timeout
+        self.client.set(self.key_prefix + key, pickle.dumps(value), ex=timeout or None)
+
+    def delete(self, key):
+        self.client.delete(self.key_prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.key_prefix + '*'):
+            self.client.delete(key)
+
+
+class NullCache(object):
+    """
+    Cache that never stores anything, for turning caching off
+    """
+
+    def __init__(self, **kwargs):
+        pass
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None, size=0):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+
+# CACHE_TYPE can be one of these or the dotted path of another class with the same methods
+BACKENDS = {
+    'simple': LRUCache,
+    'redis': RedisCache,
+    'null': NullCache,
+}
+
+
+def init_cache(app):
+    backend = app.config.get('CACHE_TYPE', 'simple')
+    if backend in BACKENDS:
+        backend = BACKENDS[backend]
+    else:
+        module_name, class_name = backend.rsplit('.', 1)
+        backend = getattr(import_module(module_name), class_name)
+    app.extensions['cache'] = backend(
+        url=app.config.get('CACHE_REDIS_URL'),
+        default_timeout=app.config.get('CACHE_DEFAULT_TIMEOUT', 300),
+        max_entries=app.config.get('CACHE_MAX_ENTRIES', 1024),
+        max_size=app.config.get('CACHE_MAX_SIZE', 64 * 1024 * 1024),
+        key_prefix=app.config.get('CACHE_KEY_PREFIX', 'cache:')
+    )
+
+
+def get_cache():
+    return current_app.extensions['cache']
+
+
+def cached(timeout=None, query_string=True):
+    """
+    Caches the responses of a route
+
+    Only GET and HEAD responses with status 200 and without cookies or Vary headers are cached, keyed by method,
+    path and (sorted) query string. Responses that vary by request headers would otherwise be served to the wrong
+    clients.
+
+    :param timeout: Seconds to cache responses for, defaults to CACHE_DEFAULT_TIMEOUT
+    :param query_string: Whether the query string is part of the key, otherwise it is ignored
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ['GET', 'HEAD']:
+                return view(*args, **kwargs)
+            cache = get_cache()
+            key = request.method + ':' + request.path
+            if query_string and request.args:
+                key += '?' + hashlib.sha1(str(sorted(request.args.items(multi=True))).encode()).hexdigest()
+            entry = cache.get(key)
+            if entry is not None:
+                body, status, headers = entry
+                return current_app.response_class(body, status=status, headers=headers)
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough and \
+                    'Set-Cookie' not in response.headers and 'Vary' not in response.headers:
+                body = response.get_data()
+                cache.set(key, (body, response.status_code, list(response.headers)), timeout=timeout, size=len(body))
+            return response
+        return wrapper
+    return decorator
@@ -1,10 +1,40 @@
+import os
+
+from pymongo import ReadPreference
+
+
 class Config(object):
     DEBUG = False
 
+    # MongoDB connection, see project/db.py. The pool is per process, so each gunicorn worker has its own
+    MONGODB_URI = os.environ.get('MONGODB_URI', 'mongodb://localhost:27017/app')
+    MONGODB_MAX_POOL_SIZE = 100
+    MONGODB_MIN_POOL_SIZE = 0
+    MONGODB_MAX_IDLE_TIME_MS = 60000
+    MONGODB_CONNECT_TIMEOUT_MS = 5000
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS = 5000
+    MONGODB_SOCKET_TIMEOUT_MS = 30000
+    MONGODB_WAIT_QUEUE_TIMEOUT_MS = 5000
+    MONGODB_READ_PREFERENCE = ReadPreference.PRIMARY
+
+    # Parsed and validated GraphQL documents kept, see project/graphql_cache.py
+    GRAPHQL_DOCUMENT_CACHE_SIZE = 1000
+
 
 class DevelopmentConfig(Config):
     DEBUG = True
 
+    # Small pool and short timeouts so a missing local mongod fails fast
+    MONGODB_MAX_POOL_SIZE = 10
+    MONGODB_CONNECT_TIMEOUT_MS = 2000
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS = 2000
+
 
 class ProductionConfig(Config):
     DEBUG = False
+
+    MONGODB_MAX_POOL_SIZE = int(os.environ.get('MONGODB_MAX_POOL_SIZE', 50))
+    # Keeps connections open between bursts of requests
+    MONGODB_MIN_POOL_SIZE = 5
+    # Reads go to a secondary when the primary is unavailable
+    MONGODB_READ_PREFERENCE = ReadPreference.PRIMARY_PREFERRED
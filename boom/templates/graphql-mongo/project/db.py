@@ -0,0 +1,22 @@
+import mongoengine
+
+
+def init_db(app):
+    """
+    Connects mongoengine with the pool, timeouts and read preference of the app config
+
+    The connection is only opened on first use, after gunicorn has forked its workers.
+    """
+    config = app.config
+    mongoengine.connect(
+        host=config.get('MONGODB_URI'),
+        maxPoolSize=config.get('MONGODB_MAX_POOL_SIZE'),
+        minPoolSize=config.get('MONGODB_MIN_POOL_SIZE'),
+        maxIdleTimeMS=config.get('MONGODB_MAX_IDLE_TIME_MS'),
+        connectTimeoutMS=config.get('MONGODB_CONNECT_TIMEOUT_MS'),
+        serverSelectionTimeoutMS=config.get('MONGODB_SERVER_SELECTION_TIMEOUT_MS'),
+        socketTimeoutMS=config.get('MONGODB_SOCKET_TIMEOUT_MS'),
+        waitQueueTimeoutMS=config.get('MONGODB_WAIT_QUEUE_TIMEOUT_MS'),
+        read_preference=config.get('MONGODB_READ_PREFERENCE'),
+        connect=False
+    )
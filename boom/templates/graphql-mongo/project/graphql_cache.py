@@ -0,0 +1,133 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+from flask import request
+from graphql import execute, format_error, parse, validate
+from graphql.error import GraphQLError
+from graphql.utils.get_operation_ast import get_operation_ast
+
+
+class DocumentCache(object):
+    """
+    LRU cache of parsed and validated GraphQL documents keyed by the sha256 hash of the query text
+
+    Cached queries skip parsing and validation. The same hashes are used for automatic persisted queries, where
+    clients send only the hash of a query the server has seen before.
+    """
+
+    def __init__(self, schema, max_entries=1000):
+        self.schema = schema
+        self.max_entries = max_entries
+        self.documents = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, query_hash):
+        with self.lock:
+            document = self.documents.get(query_hash)
+            if document is not None:
+                self.documents.move_to_end(query_hash)
+            return document
+
+    def parse(self, query, query_hash=None):
+        """
+        Gets the parsed and validated document of a query
+
+        :param query: Query text
+        :param query_hash: sha256 hex digest of the query, computed if not given
+        :return: Document or list of errors
+        """
+        query_hash = query_hash or hash_query(query)
+        document = self.get(query_hash)
+        if document is not None:
+            return document
+        try:
+            document = parse(query)
+        except GraphQLError as e:
+            return [e]
+        errors = validate(self.schema, document)
+        if errors:
+            # Invalid queries are not cached, they are not sent again by working clients
+            return errors
+        with self.lock:
+            self.documents[query_hash] = document
+            while len(self.documents) > self.max_entries:
+                self.documents.popitem(last=False)
+        return document
+
+
+def hash_query(query):
+    return hashlib.sha256(query.encode()).hexdigest()
+
+
+def get_params():
+    if request.method == 'GET':
+        params = request.args.to_dict()
+        for key in ['variables', 'extensions']:
+            if isinstance(params.get(key), str):
+                params[key] = json.loads(params.get(key))
+        return params
+    return request.get_json(force=True, silent=True) or {}
+
+
+def error_response(message, status=400, code=None):
+    error = {'message': message}
+    if code is not None:
+        error['extensions'] = {'code': code}
+    return {'errors': [error]}, status
+
+
+def execute_request(cache):
+    """
+    Executes the GraphQL request of the current flask request
+
+    Follows the automatic persisted queries protocol: the hash is given in extensions.persistedQuery.sha256Hash,
+    with or without the query. Unknown hashes without a query get a PersistedQueryNotFound error, upon which
+    clients send the query along with its hash.
+
+    :param cache: DocumentCache of the schema
+    :return: Tuple of response dict and status code
+    """
+    try:
+        params = get_params()
+    except ValueError:
+        return error_response('Variables and extensions must be JSON')
+    if not isinstance(params, dict):
+        return error_response('Request must be a JSON object')
+    query = params.get('query')
+    extensions = params.get('extensions') or {}
+    persisted = extensions.get('persistedQuery') or {} if isinstance(extensions, dict) else None
+    if not isinstance(persisted, dict):
+        return error_response('extensions and extensions.persistedQuery must be JSON objects')
+    query_hash = persisted.get('sha256Hash')
+    if not isinstance(query, (str, type(None))) or not isinstance(query_hash, (str, type(None))):
+        return error_response('query and extensions.persistedQuery.sha256Hash must be strings')
+
+    if query_hash is not None:
+        if query is None:
+            document = cache.get(query_hash)
+            if document is None:
+                return error_response('PersistedQueryNotFound', status=200, code='PERSISTED_QUERY_NOT_FOUND')
+        elif hash_query(query) != query_hash:
+            return error_response('provided sha does not match query')
+        else:
+            document = cache.parse(query, query_hash)
+    elif query is not None:
+        document = cache.parse(query)
+    else:
+        return error_response('Must provide query string.')
+    if isinstance(document, list):
+        return {'errors': [format_error(e) for e in document]}, 400
+    if request.method == 'GET':
+        operation = get_operation_ast(document, params.get('operationName'))
+        if operation is not None and operation.operation != 'query':
+            return error_response('Can only perform a %s operation from a POST request.' % operation.operation,
+                                  status=405)
+
+    result = execute(cache.schema, document, context_value=request, variable_values=params.get('variables'),
+                     operation_name=params.get('operationName'))
+    response = {'data': result.data}
+    if result.errors:
+        response['errors'] = [format_error(e) for e in result.errors]
+    return response, 200
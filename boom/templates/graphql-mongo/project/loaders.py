@@ -0,0 +1,68 @@
+from bson import DBRef
+from flask import g
+from mongoengine import Document, ReferenceField
+from promise import Promise
+from promise.dataloader import DataLoader
+
+
+class DocumentLoader(DataLoader):
+    """
+    Loads documents of a model by primary key
+
+    All keys loaded while resolving the same level of a query are fetched with a single $in query, and each document
+    is only fetched once per loader. Batching relies on the promise based executor of graphene 2 (graphql-core 2),
+    which resolves the promises returned by the loaders; graphene 3 would need an asyncio DataLoader instead.
+    """
+
+    def __init__(self, model, **kwargs):
+        kwargs.setdefault('get_cache_key', str)
+        super(DocumentLoader, self).__init__(**kwargs)
+        self.model = model
+
+    def batch_load_fn(self, keys):
+        documents = {str(document.pk): document for document in self.model.objects(pk__in=keys)}
+        return Promise.resolve([documents.get(str(key)) for key in keys])
+
+
+def get_loader(model):
+    """
+    Gets the loader of a model for the current request, so documents are not cached across requests
+    """
+    loaders = g.setdefault('dataloaders', {})
+    if model not in loaders:
+        loaders[model] = DocumentLoader(model)
+    return loaders[model]
+
+
+def get_reference_pk(value):
+    # Reading the raw value of a reference does not fetch the referenced document like attribute access does
+    if isinstance(value, Document):
+        return value.pk
+    if isinstance(value, DBRef):
+        return value.id
+    return value
+
+
+def reference_resolver(field):
+    def resolve_reference(root, info, **kwargs):
+        pk = get_reference_pk(root._data.get(field.name))
+        if pk is None:
+            return None
+        return get_loader(field.document_type).load(pk)
+    return resolve_reference
+
+
+def batch_references(type_class):
+    """
+    Resolves the ReferenceFields of a MongoengineObjectType through the loaders of the referenced models
+
+    Without this every referenced document is fetched with its own query.
+    """
+    model = type_class._meta.model
+    for name, field in model._fields.items():
+        if isinstance(field, ReferenceField):
+            resolver = staticmethod(reference_resolver(field))
+            # graphene uses resolve_<name> of the type, newer graphene-mongo versions resolve_<db_field>
+            setattr(type_class, 'resolve_' + name, resolver)
+            setattr(type_class, 'resolve_' + field.db_field, resolver)
+    return type_class
@@ -0,0 +1,161 @@
+import os
+import posixpath
+import re
+import shutil
+import tarfile
+import threading
+import zipfile
+from contextlib import contextmanager
+
+ARCHIVE_EXTENSIONS = ['.zip', '.tar.gz', '.tgz', '.tar']
+# Windows drive of an absolute member name, e.g. C:
+drive_pattern = re.compile('^[A-Za-z]:')
+
+
+def is_archive(path: str) -> bool:
+    """
+    Checks if a file is a template archive by its extension
+
+    :param path: Path to file
+    :return bool: If file is a template archive
+    """
+    return os.path.isfile(path) and any(path.endswith(extension) for extension in ARCHIVE_EXTENSIONS)
+
+
+def normalize_member_name(name: str) -> str or None:
+    """
+    Normalizes the name of an archive member
+
+    Members that are absolute or have a '..' component are rejected, as their files would be written outside the
+    project when the template is rendered.
+
+    :param name: Member name as stored in the archive
+    :return: Name relative to the archive root without trailing slash, '' for the root, or None if it is rejected
+    """
+    name = name.replace('\\', '/')
+    if name.startswith('/') or drive_pattern.match(name):
+        return None
+    parts = [part for part in name.split('/') if part not in ['', '.']]
+    if '..' in parts:
+        return None
+    return '/'.join(parts)
+
+
+class TemplateArchive:
+    """
+    Template Archive class
+
+    Reads the members of a zip or tar archive without extracting it. The archive is only ever opened for reading, so
+    any number of processes can share it. Reads are serialised per archive as tar members are read from a single
+    stream.
+    """
+    path: str = None
+    archive = None
+    members: dict = None
+
+    def __init__(self, path: str) -> None:
+        """
+        Opens an archive and reads its member list
+
+        :param path: Path to archive
+        """
+        self.path = path
+        self.lock = threading.Lock()
+        # Member name (without trailing slash) to zip info or tar info, directories map to None if only implied
+        self.members = {}
+        if zipfile.is_zipfile(path):
+            self.archive = zipfile.ZipFile(path)
+            for info in self.archive.infolist():
+                name = normalize_member_name(info.filename)
+                if name:
+                    self.add_member(name, info, info.is_dir())
+        else:
+            self.archive = tarfile.open(path, 'r:*')
+            for info in self.archive.getmembers():
+                name = normalize_member_name(info.name)
+                if (info.isfile() or info.isdir()) and name:
+                    self.add_member(name, info, info.isdir())
+
+    def add_member(self, name, info, is_dir):
+        self.members[name] = (info, is_dir)
+        # Archives do not have to list the directories of their files
+        parent = posixpath.dirname(name)
+        while parent and parent not in self.members:
+            self.members[parent] = (None, True)
+            parent = posixpath.dirname(parent)
+
+    def close(self):
+        self.archive.close()
+
+    def is_dir(self, name) -> bool:
+        """
+        :param name: Member name, '' for the archive root
+        :return bool: If member is a directory
+        """
+        return name == '' or self.members.get(name, (None, False))[1]
+
+    def exists(self, name) -> bool:
+        return name == '' or name in self.members
+
+    def list_dir(self, name):
+        """
+        Lists a directory of the archive
+
+        :param name: Member name of directory, '' for the archive root
+        :return: Sorted list of (name, is_dir)
+        """
+        prefix = name + '/' if name else ''
+        return sorted((member[len(prefix):], is_dir) for member, (_, is_dir) in self.members.items()
+                      if member.startswith(prefix) and '/' not in member[len(prefix):])
+
+    def build_tree(self, name):
+        """
+        Builds the file tree of a directory, in the format of TemplateHandler.build_tree
+
+        :param name: Member name of directory, '' for the archive root
+        :return: Dict of directory (relative to name) to sorted list of [name, is_dir] entries
+        """
+        tree = {}
+        dirs = ['']
+        while dirs:
+            rel_dir = dirs.pop()
+            entries = [[entry, is_dir] for entry, is_dir in self.list_dir(posixpath.join(name, rel_dir).rstrip('/'))]
+            tree[rel_dir] = entries
+            dirs.extend(os.path.join(rel_dir, entry) for entry, is_dir in entries if is_dir)
+        return tree
+
+    def get_size(self, name) -> int:
+        info, _ = self.members[name]
+        return info.file_size if isinstance(info, zipfile.ZipInfo) else info.size
+
+    @contextmanager
+    def open(self, name):
+        """
+        Opens a member for reading in binary mode, the data is decompressed as it is read
+
+        :param name: Member name of file
+        :return: File object
+        """
+        if name not in self.members or self.members[name][1]:
+            raise FileNotFoundError('No such file in archive %s: %s' % (self.path, name))
+        info, _ = self.members[name]
+        with self.lock:
+            f = self.archive.open(info) if isinstance(self.archive, zipfile.ZipFile) else self.archive.extractfile(info)
+            try:
+                yield f
+            finally:
+                f.close()
+
+    def read(self, name) -> bytes:
+        with self.open(name) as f:
+            return f.read()
+
+    def copy(self, name, target_path):
+        """
+        Extracts a single member to a file
+
+        :param name: Member name of file
+        :param target_path: File to write
+        """
+        with self.open(name) as f, open(target_path, 'wb') as out_file:
+            shutil.copyfileobj(f, out_file)
@@ -0,0 +1,37 @@
+import os
+
+from jinja2 import BaseLoader, TemplateNotFound
+
+
+class ArchiveLoader(BaseLoader):
+    """
+    Jinja loader reading templates from template archives
+
+    Template names are paths relative to the templates path whose first part is the archive file, e.g.
+    ``pack.zip/basic/app.py.jinja2``.
+    """
+
+    def __init__(self, templates_path, get_archive, encoding='utf-8') -> None:
+        """
+        :param templates_path: Directory holding the archives
+        :param get_archive: Function getting the opened archive of an archive path, or None if it is not an archive
+        :param encoding: Encoding of the templates
+        """
+        self.templates_path = templates_path
+        self.get_archive = get_archive
+        self.encoding = encoding
+
+    def get_source(self, environment, template):
+        parts = template.split('/')
+        for i in range(1, len(parts)):
+            archive_path = os.path.join(self.templates_path, *parts[:i])
+            archive = self.get_archive(archive_path)
+            if archive is None:
+                continue
+            name = '/'.join(parts[i:])
+            if not archive.exists(name) or archive.is_dir(name):
+                break
+            mtime = os.path.getmtime(archive_path)
+            return archive.read(name).decode(self.encoding), '%s/%s' % (archive_path, name), \
+                lambda: os.path.exists(archive_path) and os.path.getmtime(archive_path) == mtime
+        raise TemplateNotFound(template)
@@ -0,0 +1,19 @@
+import os
+
+
+def get_cache_dir(*paths) -> str:
+    """
+    Gets a directory inside boom's user cache, creating it if it does not exist
+
+    The cache root is ``$BOOM_CACHE_DIR`` if set, otherwise ``boom`` inside ``$XDG_CACHE_HOME`` (``~/.cache``).
+
+    :param paths: Path parts inside the cache root
+    :return: Absolute path of the cache directory
+    """
+    cache_root = os.environ.get('BOOM_CACHE_DIR')
+    if not cache_root:
+        cache_root = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                                  'boom')
+    cache_dir = os.path.join(os.path.abspath(cache_root), *paths)
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
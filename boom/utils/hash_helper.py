@@ -0,0 +1,72 @@
+import hashlib
+import json
+
+# Template config keys that depend on where the templates are installed rather than on their content
+LOCATION_KEYS = ['abs_dir', 'root_dir']
+
+
+def hash_text(text: str) -> str:
+    """
+    Gets the content hash of rendered text
+
+    :param text: Text as written to a file
+    :return: Hex digest
+    """
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def hash_file(path: str) -> str:
+    """
+    Gets the content hash of a file's bytes
+
+    :param path: Path to file
+    :return: Hex digest
+    """
+    with open(path, 'rb') as f:
+        return hash_fileobj(f)
+
+
+def hash_fileobj(f) -> str:
+    """
+    Gets the content hash of the rest of a binary file object, read in chunks
+
+    :param f: File object opened for reading in binary mode
+    :return: Hex digest
+    """
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: f.read(1 << 16), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_text_file(path: str) -> str or None:
+    """
+    Gets the content hash of a text file, comparable to hash_text of the text written to it
+
+    :param path: Path to file
+    :return: Hex digest or None if the file does not exist or is not text
+    """
+    try:
+        with open(path, 'r') as f:
+            return hash_text(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def hash_vars(template_vars: dict, keys: [str] = None) -> str:
+    """
+    Gets the hash of template variables
+
+    Location dependent keys of the template config are left out, so moving the templates does not change the hash.
+
+    :param template_vars: Variables used to render templates
+    :param keys: Names of the variables to hash, e.g. the ones a template uses, defaults to all of them
+    :return: Hex digest
+    """
+    if keys is not None:
+        template_vars = {key: value for key, value in template_vars.items() if key in keys}
+    template_vars = dict(template_vars)
+    if isinstance(template_vars.get('template'), dict):
+        template_vars.update(template={key: value for key, value in template_vars.get('template').items()
+                                       if key not in LOCATION_KEYS})
+    return hashlib.sha256(json.dumps(template_vars, sort_keys=True, default=str).encode()).hexdigest()
@@ -155,6 +155,47 @@ def is_path_exists_or_creatable_portable(pathname: str) -> bool:
     except OSError:
         return False
 
+
+class PathValidator:
+    """
+    Validates pathnames like `is_pathname_valid`, remembering the directories
+    already found valid.
+
+    Meant to be scoped to a single run creating many files: each directory is
+    validated once, after which only the last component of paths inside it is
+    checked.
+    """
+
+    def __init__(self) -> None:
+        self.valid_dirs = set()
+
+    def add_valid_dir(self, dirname: str) -> None:
+        """
+        Marks a directory and all of its parents as valid.
+        """
+        while dirname and dirname not in self.valid_dirs:
+            self.valid_dirs.add(dirname)
+            parent = os.path.dirname(dirname)
+            if parent == dirname:
+                break
+            dirname = parent
+
+    def is_pathname_valid(self, pathname: str) -> bool:
+        """
+        `True` if the passed pathname is a valid pathname for the current OS;
+        `False` otherwise.
+        """
+        if not isinstance(pathname, str) or not pathname:
+            return False
+        dirname, basename = os.path.split(pathname)
+        if dirname in self.valid_dirs:
+            return not basename or is_pathname_valid(basename)
+        if not is_pathname_valid(pathname):
+            return False
+        self.add_valid_dir(dirname)
+        return True
+
+
 def valid_directory(target_dir):
     """
     Checks if directory is valid
@@ -0,0 +1,140 @@
+import os
+import re
+
+requirement_name_pattern = re.compile(r'^\s*([A-Za-z0-9][A-Za-z0-9._-]*)')
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalizes a package name (PEP 503) so e.g. Flask_Cors and flask-cors compare equal
+
+    :param name: Package name
+    :return: Normalized name
+    """
+    return re.sub(r'[-_.]+', '-', name).lower()
+
+
+def parse_requirement_names(lines) -> [str]:
+    """
+    Gets the normalized package names from requirements lines
+
+    Comments, options (e.g. -r, --index-url) and blank lines are skipped.
+
+    :param lines: Lines of a requirements file
+    :return: List of normalized package names
+    """
+    names = []
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line or line.startswith('-'):
+            continue
+        match = requirement_name_pattern.match(line)
+        if match:
+            names.append(normalize_name(match.group(1)))
+    return names
+
+
+def wheel_name(filename: str) -> str or None:
+    """
+    Gets the normalized package name of a wheel file
+
+    :param filename: Wheel filename, e.g. Flask_Cors-3.0.8-py2.py3-none-any.whl
+    :return: Normalized package name or None if not a wheel
+    """
+    if not filename.endswith('.whl'):
+        return None
+    return normalize_name(filename.split('-', 1)[0])
+
+
+requirement_extras_pattern = re.compile(r'^\s*[A-Za-z0-9][A-Za-z0-9._-]*\s*\[([^\]]*)\]')
+marker_extra_pattern = re.compile(r'extra\s*==\s*[\'"]([^\'"]+)[\'"]')
+
+
+def parse_requirement_extras(line: str) -> set:
+    """
+    Gets the extras requested by a requirement line, e.g. {'async'} for flask[async]>=2
+
+    :param line: Requirement line
+    :return: Set of normalized extra names
+    """
+    match = requirement_extras_pattern.match(line)
+    if not match:
+        return set()
+    return {normalize_name(extra.strip()) for extra in match.group(1).split(',') if extra.strip()}
+
+
+def find_site_packages(venv_dir: str) -> [str]:
+    """
+    Gets the site-packages directories of a venv
+
+    :param venv_dir: Venv directory
+    :return: List of existing site-packages directories
+    """
+    import glob
+    paths = glob.glob(os.path.join(venv_dir, 'lib*', 'python*', 'site-packages'))
+    paths.append(os.path.join(venv_dir, 'Lib', 'site-packages'))
+    return [path for path in paths if os.path.isdir(path)]
+
+
+def get_installed_distributions(paths=None) -> dict:
+    """
+    Gets the distributions installed in paths, read from their metadata without running pip
+
+    :param paths: Directories to search, defaults to sys.path
+    :return: Dict of normalized name to distribution, the first found wins as on import
+    """
+    from importlib.metadata import distributions
+
+    installed = {}
+    for dist in distributions(**({} if paths is None else {'path': paths})):
+        name = dist.metadata['Name']
+        if name and normalize_name(name) not in installed:
+            installed[normalize_name(name)] = dist
+    return installed
+
+
+def resolve_pins(requirements, paths) -> [str]:
+    """
+    Pins requirements and their dependencies to the versions installed in paths
+
+    Dependencies are followed through the installed metadata, a dependency is pinned if it is installed (its markers
+    were true when it was installed) and is not only required by an extra that was not requested. A distribution is
+    walked again when it is required with extras that were not requested before.
+
+    :param requirements: Lines of a requirements file
+    :param paths: site-packages directories to resolve against
+    :return: Sorted requirement lines, requirements that are not installed are kept as they were
+    """
+    installed = get_installed_distributions(paths)
+    pins = {}
+    # Distribution name to the extras its dependencies were walked for
+    walked = {}
+    missing = []
+    queue = []
+    for line in requirements:
+        names = parse_requirement_names([line])
+        if not names:
+            continue
+        if names[0] in installed:
+            queue.append((names[0], parse_requirement_extras(line)))
+        else:
+            missing.append(line.strip())
+    while queue:
+        name, extras = queue.pop()
+        first = name not in walked
+        # Only the extras that were not requested before can add dependencies
+        extras = extras - walked.get(name, set())
+        if not first and not extras:
+            continue
+        walked.setdefault(name, set()).update(extras)
+        dist = installed[name]
+        pins[name] = '%s==%s' % (dist.metadata['Name'], dist.version)
+        for requirement in dist.requires or []:
+            requirement_name, _, marker = requirement.partition(';')
+            marker_extras = {normalize_name(extra) for extra in marker_extra_pattern.findall(marker)}
+            if not (marker_extras & extras if marker_extras else first):
+                continue
+            dependency = parse_requirement_names([requirement_name])
+            if dependency and dependency[0] in installed:
+                queue.append((dependency[0], parse_requirement_extras(requirement_name)))
+    return sorted(pins.values(), key=str.lower) + missing
@@ -0,0 +1,241 @@
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Pattern
+
+import_pattern = re.compile('^(.*)import(.*)$')
+
+
+@lru_cache(maxsize=None)
+def from_import_pattern(prefix) -> Pattern:
+    """
+    Gets the (cached) pattern matching a ``from <prefix> import ...`` line
+
+    :param prefix: Module imported from
+    :return: Compiled pattern, group 1 is the imported names
+    """
+    return re.compile('^from ' + prefix + ' import (.*)$')
+
+
+class SourceEditor:
+    """
+    Source Editor class
+
+    Applies a batch of insertions to the lines of a source file in one pass. Inserted lines are kept with the index of
+    the original line they go before and only spliced into the lines by apply, and the first line holding each marker,
+    import or ``from`` import is found once and then kept up to date, so an edit neither rescans nor shifts the whole
+    file. The resulting lines are identical to applying the same edits one after the other.
+
+    Positions are ``(index, None)`` for the original line at index and ``(index, j)`` for the j-th line inserted before
+    it, ``(len(lines), None)`` is the end of the file.
+    """
+    lines: list = None
+    changed: bool = False
+
+    def __init__(self, lines: list) -> None:
+        """
+        Initialises editor with the lines to edit (edited in place by apply)
+
+        :param lines: Lines of the file, as returned by readlines
+        """
+        self.lines = lines
+        self.changed = False
+        # Original line index to the lines inserted before it
+        self.__inserted__ = {}
+        # Position of first matching line per key, None if no line matches
+        self.__first__ = {}
+        # Count of each stripped line, for checking if a line exists
+        self.__stripped__ = None
+
+    def write_at_marker(self, line_to_write, match: Pattern or None = None, marker=None, not_exists=True):
+        """
+        Inserts a line after the marker (or the first line of the file) and the lines matching match that follow it
+
+        :param line_to_write: Line to insert, without new line
+        :param match: Pattern of the lines to insert after
+        :param marker: Text of the marker line
+        :param not_exists: Do not insert if a line is already line_to_write (ignoring surrounding whitespace)
+        :return: None if inserted, otherwise 'exists' or 'not_found'
+        """
+        if marker is None:
+            position = self.find_last_line_of(self.first_position(), match)
+        else:
+            marker_position = self.find_first(('marker', marker))
+            if marker_position is None:
+                return 'not_found'
+            if not_exists and self.contains(line_to_write):
+                return 'exists'
+            position = self.find_last_line_of(marker_position, match)
+        self.insert(position, line_to_write + '\n')
+        return None
+
+    def import_module(self, module, prefix=''):
+        """
+        Imports a module after the first import, adding it to an existing ``from <prefix> import`` if there is one
+
+        :param module: Module to import
+        :param prefix: Module to import from
+        """
+        import_position = self.find_first(('import',))
+        position = self.first_position() if import_position is None else self.next_position(import_position)
+        if prefix != '':
+            from_position = self.find_first(('from', prefix))
+            if from_position is not None:
+                found_modules = from_import_pattern(prefix).match(self.line_at(from_position)).group(1).split(', ')
+                if module not in found_modules:
+                    found_modules.append(module)
+                    self.replace(from_position, f"from {prefix} import {', '.join(found_modules)}\n")
+            else:
+                self.insert(position, f"from {prefix} import {module}\n")
+        else:
+            line_to_write = f"import {module}"
+            if not self.contains(line_to_write):
+                self.insert(position, line_to_write)
+
+    def apply(self) -> list:
+        """
+        Splices the inserted lines into the lines
+
+        :return: The edited lines
+        """
+        if self.__inserted__:
+            lines = []
+            for index, line in enumerate(self.lines):
+                lines.extend(self.__inserted__.get(index, ()))
+                lines.append(line)
+            lines.extend(self.__inserted__.get(len(self.lines), ()))
+            self.lines[:] = lines
+            self.__inserted__ = {}
+            self.__first__ = {}
+        return self.lines
+
+    def first_position(self):
+        return (0, 0) if self.__inserted__.get(0) else (0, None)
+
+    def next_position(self, position):
+        index, j = position
+        if j is not None:
+            return (index, j + 1) if j + 1 < len(self.__inserted__[index]) else (index, None)
+        return (index + 1, 0) if self.__inserted__.get(index + 1) else (index + 1, None)
+
+    def line_at(self, position):
+        """
+        Gets the line at a position
+
+        :param position: Position of line
+        :return: Line or None at the end of the file
+        """
+        index, j = position
+        if j is not None:
+            return self.__inserted__[index][j]
+        return self.lines[index] if index < len(self.lines) else None
+
+    def find_last_line_of(self, position, match: Pattern or None):
+        """
+        Gets the position after a line and the lines matching match (or empty) that follow it
+
+        :param position: Position of line
+        :param match: Pattern of lines to skip
+        :return: Position
+        """
+        position = self.next_position(position)
+        if match is not None:
+            line = self.line_at(position)
+            while line is not None and (match.match(line) or len(line) == 0):
+                position = self.next_position(position)
+                line = self.line_at(position)
+        return position
+
+    def find_first(self, key):
+        """
+        Gets the position of the first line matching key
+
+        :param key: ('marker', text), ('import',) or ('from', prefix)
+        :return: Position or None
+        """
+        if key not in self.__first__:
+            first = None
+            position = self.first_position()
+            line = self.line_at(position)
+            while line is not None:
+                if self.__matches__(key, line):
+                    first = position
+                    break
+                position = self.next_position(position)
+                line = self.line_at(position)
+            self.__first__[key] = first
+        return self.__first__[key]
+
+    def contains(self, text) -> bool:
+        """
+        Checks if any line is text, ignoring surrounding whitespace
+
+        :param text: Text without new lines
+        :return bool: If a line is text
+        """
+        if self.__stripped__ is None:
+            self.__stripped__ = Counter(line.strip() for line in self.lines)
+            for inserted in self.__inserted__.values():
+                self.__stripped__.update(line.strip() for line in inserted)
+        return self.__stripped__[text.strip()] > 0
+
+    def insert(self, position, line):
+        """
+        Inserts a line before a position, keeping the index up to date
+
+        :param position: Position to insert at
+        :param line: Line to insert
+        """
+        index, j = position
+        inserted = self.__inserted__.setdefault(index, [])
+        if j is None:
+            j = len(inserted)
+            inserted.append(line)
+        else:
+            inserted.insert(j, line)
+        self.changed = True
+        if self.__stripped__ is not None:
+            self.__stripped__[line.strip()] += 1
+        for key, first in self.__first__.items():
+            if first is not None and first[0] == index and first[1] is not None and first[1] >= j:
+                first = (index, first[1] + 1)
+            if (first is None or sort_key((index, j)) < sort_key(first)) and self.__matches__(key, line):
+                first = (index, j)
+            self.__first__[key] = first
+
+    def replace(self, position, line):
+        """
+        Replaces a line, keeping the index up to date
+
+        :param position: Position of line to replace
+        :param line: New line
+        """
+        index, j = position
+        if self.__stripped__ is not None:
+            self.__stripped__[self.line_at(position).strip()] -= 1
+            self.__stripped__[line.strip()] += 1
+        if j is None:
+            self.lines[index] = line
+        else:
+            self.__inserted__[index][j] = line
+        self.changed = True
+        for key, first in list(self.__first__.items()):
+            if self.__matches__(key, line):
+                if first is None or sort_key(position) < sort_key(first):
+                    self.__first__[key] = position
+            elif first == position:
+                del self.__first__[key]
+
+    @staticmethod
+    def __matches__(key, line) -> bool:
+        if key[0] == 'marker':
+            return key[1] in line
+        if key[0] == 'import':
+            return bool(import_pattern.match(line))
+        return bool(from_import_pattern(key[1]).match(line))
+
+
+def sort_key(position):
+    # Inserted lines come before the original line they were inserted at
+    index, j = position
+    return (index, 0, j) if j is not None else (index, 1, 0)
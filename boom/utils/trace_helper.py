@@ -0,0 +1,150 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Tracer of the current run, None when not tracing
+tracer = None
+
+
+class Tracer:
+    """
+    Tracer class
+
+    Records spans as events of the Chrome trace event format, so a trace can be opened in chrome://tracing or Perfetto.
+    Spans of the same thread nest by their timestamps.
+    """
+
+    def __init__(self) -> None:
+        self.events = []
+        self.lock = threading.Lock()
+        self.start = time.perf_counter_ns()
+        self.threads = {}
+        # Arguments of the open spans of each thread, innermost last
+        self.local = threading.local()
+
+    @contextmanager
+    def span(self, name, **args):
+        """
+        Records a span around the body of the with statement
+
+        :param name: Name of span
+        :param args: Arguments shown with the span, the yielded dict can be updated to add more, e.g. bytes written
+        :return: Dict of arguments
+        """
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        self.local.stack.append(args)
+        start = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            self.add_event(name, start, time.perf_counter_ns() - start, args)
+            self.local.stack.pop()
+
+    def add_event(self, name, start, duration, args=None):
+        """
+        Records a complete span
+
+        :param name: Name of span
+        :param start: Start in perf_counter_ns
+        :param duration: Duration in nanoseconds
+        :param args: Arguments shown with the span
+        """
+        event = {'name': name, 'cat': 'boom', 'ph': 'X', 'pid': os.getpid(), 'tid': self.get_thread_id(),
+                 'ts': (start - self.start) / 1000, 'dur': duration / 1000}
+        if args:
+            event.update(args=args)
+        with self.lock:
+            self.events.append(event)
+
+    def get_thread_id(self):
+        # Small ids in order of first use read better than thread idents
+        ident = threading.get_ident()
+        if ident not in self.threads:
+            with self.lock:
+                self.threads.setdefault(ident, (len(self.threads) + 1, threading.current_thread().name))
+        return self.threads[ident][0]
+
+    def write(self, path):
+        """
+        Writes the trace as JSON
+
+        :param path: Path of trace file
+        """
+        metadata = [{'name': 'thread_name', 'ph': 'M', 'pid': os.getpid(), 'tid': tid, 'args': {'name': name}}
+                    for tid, name in self.threads.values()]
+        with open(path, 'w') as f:
+            f.write(json.dumps({'traceEvents': metadata + self.events, 'displayTimeUnit': 'ms'}))
+
+    def summary(self):
+        """
+        Sums the spans by name, in order of first start
+
+        :return: List of [name, count, total ms, max ms, args summed over the spans]
+        """
+        rows = {}
+        for event in sorted(self.events, key=lambda e: e.get('ts')):
+            row = rows.setdefault(event.get('name'), [event.get('name'), 0, 0.0, 0.0, {}])
+            row[1] += 1
+            row[2] += event.get('dur') / 1000
+            row[3] = max(row[3], event.get('dur') / 1000)
+            for key, value in event.get('args', {}).items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    row[4][key] = row[4].get(key, 0) + value
+        return list(rows.values())
+
+
+def start_tracing() -> Tracer:
+    """
+    Starts recording spans for the rest of the run
+
+    :return: Tracer
+    """
+    global tracer
+    tracer = Tracer()
+    return tracer
+
+
+def span(name, **args):
+    """
+    Records a span around the body of the with statement if tracing, otherwise does nothing
+
+    :param name: Name of span
+    :param args: Arguments shown with the span
+    :return: Context manager yielding the dict of arguments, which can be updated
+    """
+    if tracer is None:
+        return nullcontext(args)
+    return tracer.span(name, **args)
+
+
+def traced(name):
+    """
+    Decorator recording a span around each call of a function if tracing
+
+    :param name: Name of span
+    :return: Decorator
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if tracer is None:
+                return function(*args, **kwargs)
+            with tracer.span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def annotate(**args):
+    """
+    Adds arguments to the innermost open span of the current thread if tracing, e.g. files=10, bytes=4096
+
+    :param args: Arguments shown with the span
+    """
+    stack = getattr(tracer.local, 'stack', None) if tracer is not None else None
+    if stack:
+        stack[-1].update(args)
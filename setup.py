@@ -8,8 +8,10 @@ setup(name='flask-boom',
       description='Project Generator CLI for flask',
       author='Tom Grozev',
       author_email='enquires@tomgrozev.com',
-      packages=['boom', 'boom.utils', 'boom.schema', 'boom.handlers', 'boom.commands'],
+      packages=['boom', 'boom.utils', 'boom.schema', 'boom.handlers', 'boom.commands',
+                'boom.scripts'],
       include_package_data=True,
+      python_requires='>=3.8',
       install_requires=[
         'click~=7.1.1',
         'setuptools~=46.1.3',
@@ -23,6 +25,9 @@ setup(name='flask-boom',
         'schema~=0.7.2',
         'tabulate~=0.8.7',
       ],
+      extras_require={
+          'watch': ['watchdog>=2.1'],
+      },
       entry_points={
           'console_scripts': [
               'boom = boom.__main__:cli'